@@ -0,0 +1,333 @@
+import argparse
+import builtins
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from contextlib import contextmanager, redirect_stdout
+from datetime import datetime, timedelta
+from itertools import cycle
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import personal_assisnant as pa
+
+WORDS = ['покупка', 'шаурма', 'такси', 'зарплата', 'кофе', 'аренда', 'подарок', 'продукты', 'метро', 'кино']
+TEXT_WORDS = WORDS + ['проект', 'встреча', 'отчёт', 'питон', 'семинар', 'библиотека', 'дедлайн', 'список',
+                      'молоко', 'хлеб', 'врач', 'билеты', 'отпуск', 'ремонт', 'презентация', 'экзамен']
+CATEGORIES = ['Еда', 'Транспорт', 'Зарплата', 'Развлечения', 'Жильё', 'Здоровье']
+PRIORITIES = ['Высокий', 'Средний', 'Низкий']
+FIRST_NAMES = ['Александр', 'Мария', 'Дмитрий', 'Анна', 'Сергей', 'Елена', 'Иван', 'Ольга', 'Пётр', 'Наталья']
+LAST_NAMES = ['Иванов', 'Смирнова', 'Кузнецов', 'Попова', 'Соколов', 'Лебедева', 'Козлов', 'Новикова', 'Морозов', 'Волкова']
+TRANSLIT = str.maketrans({
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'е': 'e', 'ё': 'e', 'ж': 'zh', 'з': 'z', 'и': 'i', 'й': 'y',
+    'к': 'k', 'л': 'l', 'м': 'm', 'н': 'n', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'у': 'u', 'ф': 'f',
+    'х': 'h', 'ц': 'c', 'ч': 'ch', 'ш': 'sh', 'щ': 'sch', 'ъ': '', 'ы': 'y', 'ь': '', 'э': 'e', 'ю': 'yu', 'я': 'ya',
+})
+EPOCH = datetime(2015, 1, 1)
+
+
+def random_date(rng):
+    return f"{rng.randint(1, 28):02d}-{rng.randint(1, 12):02d}-{rng.randint(2015, 2024)}"
+
+
+def random_timestamp(rng):
+    return (EPOCH + timedelta(seconds=rng.randint(0, 10 * 365 * 86400))).strftime("%d-%m-%Y %H:%M:%S")
+
+
+def generate_notes(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'title': ' '.join(rng.choices(TEXT_WORDS, k=3)).capitalize(),
+            'content': ' '.join(rng.choices(TEXT_WORDS, k=rng.randint(5, 30))),
+            'timestamp': random_timestamp(rng),
+        }
+        for _ in range(count)
+    ]
+
+
+def generate_tasks(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'title': ' '.join(rng.choices(TEXT_WORDS, k=2)).capitalize(),
+            'description': ' '.join(rng.choices(TEXT_WORDS, k=rng.randint(3, 12))),
+            'done': rng.choice(['done', 'not done']),
+            'priority': rng.choice(PRIORITIES),
+            'due_date': random_date(rng),
+            'created_at': random_timestamp(rng),
+        }
+        for _ in range(count)
+    ]
+
+
+def generate_contacts(count, seed=0):
+    rng = random.Random(seed)
+    contacts = []
+    for _ in range(count):
+        first_name, last_name = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        contacts.append({
+            'name': f"{first_name} {last_name}",
+            'phone': rng.choice(['8', '+7']) + ''.join(rng.choices('0123456789', k=10)),
+            'email': f"{last_name.lower().translate(TRANSLIT)}{rng.randint(1, 9999)}@mail.ru",
+        })
+    return contacts
+
+
+def generate_transactions(count, seed=0):
+    rng = random.Random(seed)
+    return [
+        {
+            'description': ' '.join(rng.choices(WORDS, k=3)),
+            'amount': round(rng.uniform(-5000, 5000), 2),
+            'date': random_date(rng),
+            'category': rng.choice(CATEGORIES),
+        }
+        for _ in range(count)
+    ]
+
+
+GENERATORS = {
+    pa.Note: generate_notes,
+    pa.Task: generate_tasks,
+    pa.Contact: generate_contacts,
+    pa.Finance: generate_transactions,
+}
+
+
+@contextmanager
+def stubbed_input(answers):
+    # ответы на input() выдаются по кругу, вывод менеджеров отбрасывается
+    answers = cycle(answers)
+    original = builtins.input
+    builtins.input = lambda prompt='': next(answers)
+    try:
+        with open(os.devnull, 'w', encoding='utf-8') as devnull, redirect_stdout(devnull):
+            yield
+    finally:
+        builtins.input = original
+
+
+def percentile(values, share):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(share * (len(ordered) - 1))))]
+
+
+def summarize(latencies, units, unit):
+    total = sum(latencies)
+    return {
+        'count': len(latencies),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 3),
+        'p90_ms': round(percentile(latencies, 0.9) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(max(latencies) * 1000, 3),
+        'mean_ms': round(total / len(latencies) * 1000, 3),
+        'throughput': round(units * len(latencies) / total, 1) if total else None,
+        'unit': unit,
+    }
+
+
+def measure(function, repeat, setup=None):
+    latencies = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        started = time.perf_counter()
+        function()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def measure_calls(function, answers):
+    # каждая интерактивная операция получает свой набор ответов на input()
+    latencies = []
+    for answer in answers:
+        with stubbed_input(answer):
+            started = time.perf_counter()
+            function()
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def reset_store(record_class, records=()):
+    repository = pa.get_repository(record_class)
+    with repository.transaction():
+        repository.delete([record['id'] for record in repository])
+        if records:
+            repository.add(records)
+
+
+def peak_rss_kb():
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage // 1024 if sys.platform == 'darwin' else usage
+
+
+def bench_store(record_class, rows, repeat, backend):
+    name = record_class.__name__.lower()
+    records = GENERATORS[record_class](rows)
+    pa.assign_ids(records)
+    results = {}
+    if backend == 'json':
+        results[f'{name}.save_data'] = summarize(
+            measure(lambda: pa.save_data(record_class.FILE_PATH, records), repeat), rows, 'rows/s')
+        results[f'{name}.load_data'] = summarize(
+            measure(lambda: pa.load_data(record_class.FILE_PATH), repeat), rows, 'rows/s')
+    else:
+        results[f'{name}.bulk_add'] = summarize(
+            measure(lambda: pa.get_repository(record_class).add(records), repeat, lambda: reset_store(record_class)),
+            rows, 'rows/s')
+    results[f'{name}.full_scan'] = summarize(
+        measure(lambda: sum(1 for _ in pa.get_repository(record_class)), repeat,
+                lambda: pa.repositories.pop(record_class.FILE_PATH, None)), rows, 'rows/s')
+    csv_name = f'{name}_bench.csv'
+    export = {
+        pa.Note: pa.NotesManager.export_to_csv,
+        pa.Task: pa.TasksManager.export_to_csv_tasks,
+        pa.Contact: pa.ContactsManager.export_to_csv_contacts,
+        pa.Finance: pa.FinanceManager.export_to_csv_finance,
+    }[record_class]
+    results[f'{name}.export_csv'] = summarize(
+        measure_calls(export, [[csv_name, '', '', '']] * repeat), rows, 'rows/s')
+    import_ = {
+        pa.Note: pa.NotesManager.import_from_csv_notes,
+        pa.Task: pa.TasksManager.import_from_csv_tasks,
+        pa.Contact: pa.ContactsManager.import_from_csv_contacts,
+        pa.Finance: pa.FinanceManager.import_from_csv_finance,
+    }[record_class]
+    latencies = []
+    for _ in range(repeat):
+        reset_store(record_class)
+        latencies += measure_calls(import_, [[csv_name]])
+    results[f'{name}.import_csv'] = summarize(latencies, rows, 'rows/s')
+    os.remove(csv_name)
+    reset_store(record_class, records)
+    return records, results
+
+
+def bench_queries(samples, stores, seed=0):
+    rng = random.Random(seed)
+    notes, tasks, contacts, transactions = (stores[record_class] for record_class in GENERATORS)
+    results = {}
+
+    def contact_query():
+        contact = rng.choice(contacts)
+        kind = rng.randrange(4)
+        if kind == 0:
+            return contact['name'].split()[0][:3]
+        if kind == 1:
+            return contact['phone'][-7:]
+        if kind == 2:
+            return contact['email']
+        name = contact['name']
+        position = rng.randrange(len(name))
+        return name[:position] + name[position + 1:]
+
+    results['contacts.search_contact'] = summarize(
+        measure_calls(pa.ContactsManager.search_contact, [[contact_query()] for _ in range(samples)]), 1, 'ops/s')
+    results['notes.search_notes'] = summarize(
+        measure_calls(pa.NotesManager.search_notes,
+                      [[' '.join(rng.choices(TEXT_WORDS, k=2))] for _ in range(samples)]), 1, 'ops/s')
+    results['tasks.mark_task_as_done'] = summarize(
+        measure_calls(pa.TasksManager.mark_task_as_done,
+                      [[str(rng.choice(tasks)['id'])] for _ in range(samples)]), 1, 'ops/s')
+    report_answers = []
+    for _ in range(samples):
+        first, second = sorted([random_date(rng), random_date(rng)], key=pa.date_ordinal)
+        report_answers.append([first, second, rng.choice(['', '1', '2'])])
+    results['finance.generate_report'] = summarize(
+        measure_calls(pa.FinanceManager.generate_report, report_answers), 1, 'ops/s')
+    for file_name in os.listdir('.'):
+        if file_name.startswith('report_'):
+            os.remove(file_name)
+    return results
+
+
+def bench_codecs(rows, repeat):
+    data = generate_transactions(rows)
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'finance.json')
+        for codec in pa.CODECS:
+            save_times, load_times = [], []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                pa.write_snapshot(path, data, codec)
+                save_times.append(time.perf_counter() - started)
+                started = time.perf_counter()
+                pa.read_snapshot(path)
+                load_times.append(time.perf_counter() - started)
+            results[codec] = {
+                'save_s': round(min(save_times), 4),
+                'load_s': round(min(load_times), 4),
+                'size_bytes': os.path.getsize(path),
+            }
+    return results
+
+
+def run_scale(rows, repeat, samples, backend, codecs):
+    # всё хранилище живёт во временном каталоге, рабочие файлы приложения не трогаются
+    report = {'rows': rows, 'backend': backend, 'codec': pa.STORAGE_CODEC, 'operations': {}}
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        try:
+            pa.repositories.clear()
+            pa.STORAGE_BACKEND = backend
+            pa.SQLITE_PATH = os.path.join(directory, 'bench.db')
+            stores = {}
+            for record_class in GENERATORS:
+                stores[record_class], results = bench_store(record_class, rows, repeat, backend)
+                report['operations'].update(results)
+            report['operations'].update(bench_queries(samples, stores))
+            if codecs:
+                report['codecs'] = bench_codecs(rows, repeat)
+        finally:
+            os.chdir(cwd)
+            pa.repositories.clear()
+            for connection in pa.sqlite_connections.values():
+                connection.close()
+            pa.sqlite_connections.clear()
+    report['peak_rss_kb'] = peak_rss_kb()
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замеры производительности персонального помощника")
+    parser.add_argument('--rows', type=int, nargs='+', default=[10000],
+                        help="число записей каждого вида; несколько значений — по процессу на каждое")
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--samples', type=int, default=200, help="число запросов поиска, отметок и отчётов")
+    parser.add_argument('--backend', choices=['json', 'sqlite'], default=pa.STORAGE_BACKEND)
+    parser.add_argument('--codecs', action='store_true', help="дополнительно сравнить кодеки снимков")
+    parser.add_argument('--output', help="файл для JSON-отчёта (по умолчанию stdout)")
+    args = parser.parse_args()
+    if len(args.rows) == 1:
+        report = run_scale(args.rows[0], args.repeat, args.samples, args.backend, args.codecs)
+    else:
+        # пиковая память считается на процесс, поэтому каждый объём меряется в отдельном процессе
+        report = []
+        for rows in args.rows:
+            command = [sys.executable, os.path.abspath(__file__), '--rows', str(rows), '--repeat', str(args.repeat),
+                       '--samples', str(args.samples), '--backend', args.backend]
+            if args.codecs:
+                command.append('--codecs')
+            report.append(json.loads(subprocess.run(command, check=True, capture_output=True, text=True).stdout))
+    output = json.dumps(report, ensure_ascii=False, indent=4)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,18 +1,1044 @@
+import argparse
+import ast
+import atexit
 import json
 import csv
+import gzip
+import heapq
+import inspect
+import math
 import os
-from datetime import datetime
+import re
+import sqlite3
+import stat
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from bisect import bisect_left, bisect_right, insort
+from contextlib import ExitStack, contextmanager
+from datetime import date, datetime
+from functools import lru_cache, reduce, wraps
+from itertools import accumulate, islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+JOURNAL_SUFFIX = '.log'
+COMPACT_THRESHOLD = 1000
+IMPORT_BATCH_SIZE = 10000
+EXPORT_CHUNK_SIZE = 10000
+PAGE_SIZE = 20
+STORAGE_BACKEND = os.environ.get('PA_BACKEND', 'json')
+SQLITE_PATH = os.environ.get('PA_SQLITE_PATH', 'assistant.db')
+STORAGE_CODEC = os.environ.get('PA_CODEC', 'json')
+FSYNC = os.environ.get('PA_FSYNC', '1') != '0'
+STATS_TARGET = os.environ.get('PA_STATS', '0')
+PROFILE_MODE = os.environ.get('PA_PROFILE', '')
+MSGPACK_MAGIC = b'PAMSGPK1'
+ID_STATE_PATH = 'ids.state'
+ID_EPOCH_MS = 1704067200000
+ID_SEQUENCE_BITS = 12
+
+
+def record_default(value):
+    # записи со слотами сериализуются через словарь полей
+    if isinstance(value, Record):
+        return value.to_dict()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def json_dumps(data):
+    return json.dumps(data, ensure_ascii=False, indent=4, default=record_default).encode('utf-8')
+
+
+def compact_dumps(data):
+    return json.dumps(data, ensure_ascii=False, separators=(',', ':'), default=record_default).encode('utf-8')
+
+
+def orjson_dumps(data):
+    return orjson.dumps(data, default=record_default)
+
+
+def msgpack_dumps(data):
+    return MSGPACK_MAGIC + msgpack.packb(data, use_bin_type=True, default=record_default)
+
+
+# Кодеки снимка: json — прежний формат с отступами, compact — JSON без пробелов,
+# orjson и msgpack доступны, если установлены соответствующие пакеты.
+CODECS = {'json': json_dumps, 'compact': compact_dumps}
+if orjson is not None:
+    CODECS['orjson'] = orjson_dumps
+if msgpack is not None:
+    CODECS['msgpack'] = msgpack_dumps
+
+
+def encode_data(data, codec=None):
+    codec = codec or STORAGE_CODEC
+    if codec not in CODECS:
+        raise ValueError(f"Неизвестный или неустановленный кодек: {codec}")
+    return CODECS[codec](data)
+
+
+def decode_data(raw):
+    # формат определяется по заголовку файла
+    if raw.startswith(MSGPACK_MAGIC):
+        if msgpack is None:
+            raise RuntimeError("Для чтения файла нужен пакет msgpack")
+        return msgpack.unpackb(raw[len(MSGPACK_MAGIC):], raw=False)
+    if not raw.strip():
+        return []
+    if orjson is not None:
+        return orjson.loads(raw)
+    return json.loads(raw)
+
+
+def dumps_line(entry):
+    if orjson is not None:
+        return orjson.dumps(entry, default=record_default).decode('utf-8') + '\n'
+    return json.dumps(entry, ensure_ascii=False, default=record_default) + '\n'
 
-def load_data(file_path):
+
+def loads_line(line):
+    if orjson is not None:
+        return orjson.loads(line)
+    return json.loads(line)
+
+
+def read_file(file_path):
     if os.path.exists(file_path):
-        with open(file_path, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    return []
+        with open(file_path, 'rb') as f:
+            return f.read()
+    return b''
+
+
+def existing_mode(*paths):
+    # mkstemp создаёт файлы с правами 0600; новый файл получает права первого существующего из paths
+    for path in paths:
+        if os.path.exists(path):
+            return stat.S_IMODE(os.stat(path).st_mode)
+    return 0o644
+
+
+def write_file_atomic(file_path, raw):
+    # запись во временный файл рядом с целевым и атомарная замена: после сбоя на диске
+    # остаётся либо старая, либо новая версия файла
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=os.path.basename(file_path) + '.', suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(raw)
+            if FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+        os.chmod(temp_path, existing_mode(file_path))
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+    if FSYNC and hasattr(os, 'O_DIRECTORY'):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+def read_snapshot(file_path):
+    return decode_data(read_file(file_path))
+
+
+def write_snapshot(file_path, data, codec=None):
+    write_file_atomic(file_path, encode_data(data, codec))
+
+
+class Journal:
+    # Снимок (*.json) + журнал операций (*.json.log): вставки дописываются в конец,
+    # удаления записываются как tombstone, снимок переписывается только при компактификации.
+    # Транзакция пишет записи в отдельный сегмент и фиксируется одной строкой include в журнале.
+    # Первая строка журнала хранит CRC снимка, к которому он относится: если компактификация
+    # прервалась после замены снимка, уже влитый журнал не применяется повторно.
+    def __init__(self, file_path):
+        self.file_path = file_path
+        self.log_path = file_path + JOURNAL_SUFFIX
+        self.base = None
+        self.stale = False
+        self.pending = None
+        self.segment = None
+        self.segment_name = None
+        self.segment_entries = 0
+
+    def read_entries(self, path):
+        if not os.path.exists(path):
+            return
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield loads_line(line)
+                except ValueError:
+                    # оборванная последняя запись после сбоя
+                    break
+
+    def segment_path(self, name):
+        return os.path.join(os.path.dirname(os.path.abspath(self.log_path)), name)
+
+    def read_log(self):
+        if self.base is None:
+            self.base = zlib.crc32(read_file(self.file_path))
+        for entry in self.read_entries(self.log_path):
+            op = entry['op']
+            if op == 'base':
+                if entry['crc'] != self.base:
+                    self.stale = True
+                    return
+            elif op == 'include':
+                yield from self.read_entries(self.segment_path(entry['path']))
+            else:
+                yield entry
+
+    def load(self):
+        raw = read_file(self.file_path)
+        self.base = zlib.crc32(raw)
+        self.stale = False
+        records = decode_data(raw)
+        positions = {}
+        for i, record in enumerate(records):
+            if 'id' in record:
+                positions.setdefault(record['id'], []).append(i)
+        pending = 0
+        for entry in self.read_log():
+            pending += 1
+            op = entry['op']
+            if op == 'add':
+                for record in entry['records']:
+                    if 'id' in record:
+                        positions.setdefault(record['id'], []).append(len(records))
+                    records.append(record)
+            elif op == 'del':
+                for record_id in entry['ids']:
+                    for i in positions.pop(record_id, ()):
+                        records[i] = None
+            elif op == 'set':
+                for i in positions.get(entry['id'], ()):
+                    records[i].update(entry['fields'])
+        self.pending = pending
+        return [record for record in records if record is not None]
+
+    def write(self, entry):
+        line = dumps_line(entry)
+        if self.segment is not None:
+            self.segment.write(line)
+            self.segment_entries += 1
+            return
+        if self.pending is None:
+            self.pending = sum(1 for _ in self.read_log())
+        if self.stale:
+            self.discard_log()
+        header = '' if os.path.exists(self.log_path) else dumps_line({'op': 'base', 'crc': self.base})
+        with open(self.log_path, 'a', encoding='utf-8') as f:
+            f.write(header + line)
+            if FSYNC:
+                f.flush()
+                os.fsync(f.fileno())
+        self.pending += 1
+
+    def begin(self):
+        fd, path = tempfile.mkstemp(prefix=os.path.basename(self.log_path) + '.', suffix='.seg',
+                                    dir=os.path.dirname(os.path.abspath(self.log_path)))
+        self.segment = os.fdopen(fd, 'w', encoding='utf-8')
+        self.segment_name = path
+        self.segment_entries = 0
+
+    def commit(self):
+        segment, self.segment = self.segment, None
+        if FSYNC:
+            segment.flush()
+            os.fsync(segment.fileno())
+        segment.close()
+        if not self.segment_entries:
+            os.remove(self.segment_name)
+            return
+        os.chmod(self.segment_name, existing_mode(self.log_path, self.file_path))
+        self.write({'op': 'include', 'path': os.path.basename(self.segment_name)})
+        self.pending += self.segment_entries
+
+    def rollback(self):
+        segment, self.segment = self.segment, None
+        segment.close()
+        os.remove(self.segment_name)
+
+    def needs_compaction(self):
+        return self.pending is not None and self.pending >= COMPACT_THRESHOLD
+
+    def append(self, records):
+        self.write({'op': 'add', 'records': records})
+
+    def delete(self, ids):
+        self.write({'op': 'del', 'ids': ids})
+
+    def update(self, record_id, fields):
+        self.write({'op': 'set', 'id': record_id, 'fields': fields})
+
+    def compact(self, data):
+        raw = encode_data(data)
+        write_file_atomic(self.file_path, raw)
+        self.base = zlib.crc32(raw)
+        self.discard_log()
+        self.pending = 0
+
+    def discard_log(self):
+        segments = [entry['path'] for entry in self.read_entries(self.log_path) if entry['op'] == 'include']
+        if os.path.exists(self.log_path):
+            os.remove(self.log_path)
+        for name in segments:
+            if os.path.exists(self.segment_path(name)):
+                os.remove(self.segment_path(name))
+        self.stale = False
+
+
+def date_ordinal(date_string):
+    # быстрый разбор DD-MM-YYYY без strptime: индексы строятся по всем записям при загрузке
+    try:
+        day, month, year = date_string.split('-')
+        return date(int(year), int(month), int(day)).toordinal()
+    except (AttributeError, ValueError):
+        return None
+
+
+@lru_cache(maxsize=65536)
+def pack_date(value):
+    # дата DD-MM-YYYY хранится порядковым номером дня, если обратное преобразование даёт ту же строку
+    if (type(value) is str and len(value) == 10 and value.isascii() and value[2] == '-' and value[5] == '-'
+            and value[:2].isdigit() and value[3:5].isdigit() and value[6:].isdigit()):
+        ordinal = date_ordinal(value)
+        if ordinal is not None:
+            return ordinal
+    return value
+
+
+@lru_cache(maxsize=65536)
+def unpack_date(value):
+    if type(value) is not int:
+        return value
+    day = date.fromordinal(value)
+    return f"{day.day:02d}-{day.month:02d}-{day.year:04d}"
+
+
+def field_ordinal(record, field):
+    # запись со слотами уже хранит порядковый номер дня — строку разбирать не нужно
+    value = record.raw(field) if isinstance(record, Record) else record[field]
+    return value if type(value) is int else date_ordinal(value)
+
+
+class Record:
+    # Базовый класс записей: поля лежат в __slots__, а не в словаре экземпляра.
+    # Даты из DATE_FIELDS хранятся числом и превращаются в строку только при чтении,
+    # повторяющиеся строки из INTERNED (категории, приоритеты) интернируются.
+    # Неизвестные поля старых файлов сохраняются в _extra, чтобы не терять данные.
+    # Запись ведёт себя как словарь, поэтому остальной код работает с ней как раньше.
+    __slots__ = ()
+    FIELDS = []
+    DATE_FIELDS = ()
+    INTERNED = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.FIELD_SET = frozenset(cls.FIELDS)
+        cls.PLAIN_FIELDS = cls.FIELD_SET - set(cls.DATE_FIELDS) - set(cls.INTERNED)
+
+    @classmethod
+    def from_dict(cls, data):
+        if isinstance(data, cls):
+            return data
+        # разбор полей без вызова __setitem__: при загрузке большого файла это заметно быстрее
+        record = cls.__new__(cls)
+        plain, dates, interned = cls.PLAIN_FIELDS, cls.DATE_FIELDS, cls.INTERNED
+        for name, value in data.items():
+            if name in plain:
+                setattr(record, name, value)
+            elif name in dates:
+                setattr(record, name, pack_date(value))
+            elif name in interned and type(value) is str:
+                setattr(record, name, sys.intern(value))
+            else:
+                record[name] = value
+        return record
+
+    def raw(self, name):
+        try:
+            return getattr(self, name) if name in self.FIELD_SET else self._extra[name]
+        except (AttributeError, TypeError):
+            raise KeyError(name)
+
+    def __getitem__(self, name):
+        if name not in self.FIELD_SET:
+            return self.raw(name)
+        try:
+            value = getattr(self, name)
+        except AttributeError:
+            raise KeyError(name)
+        return unpack_date(value) if name in self.DATE_FIELDS else value
+
+    def __setitem__(self, name, value):
+        if name in self.FIELD_SET:
+            if name in self.DATE_FIELDS:
+                value = pack_date(value)
+            elif name in self.INTERNED and type(value) is str:
+                value = sys.intern(value)
+            setattr(self, name, value)
+            return
+        extra = getattr(self, '_extra', None)
+        if extra is None:
+            extra = self._extra = {}
+        extra[name] = value
+
+    def __contains__(self, name):
+        if name in self.FIELD_SET:
+            return hasattr(self, name)
+        extra = getattr(self, '_extra', None)
+        return extra is not None and name in extra
+
+    def get(self, name, default=None):
+        try:
+            return self[name]
+        except KeyError:
+            return default
+
+    def keys(self):
+        names = [name for name in self.FIELDS if hasattr(self, name)]
+        extra = getattr(self, '_extra', None)
+        return names + list(extra) if extra else names
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def items(self):
+        return [(name, self[name]) for name in self.keys()]
+
+    def update(self, fields):
+        for name, value in fields.items():
+            self[name] = value
+
+    def to_dict(self):
+        return {name: self[name] for name in self.keys()}
+
+    def row(self, fields, default=''):
+        # значения полей списком — для выгрузки в CSV без промежуточного словаря
+        values = []
+        for name in fields:
+            if name in self.FIELD_SET:
+                value = getattr(self, name, default)
+                values.append(unpack_date(value) if name in self.DATE_FIELDS else value)
+            else:
+                values.append(self.get(name, default))
+        return values
+
+    def __eq__(self, other):
+        if isinstance(other, (Record, dict)):
+            return self.to_dict() == dict(other.items())
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+def normalize_phone(phone):
+    digits = ''.join(ch for ch in str(phone) if ch.isdigit())
+    if len(digits) == 11 and digits[0] == '8':
+        digits = '7' + digits[1:]
+    return digits or None
+
+
+def normalize_name(name):
+    return ' '.join(str(name).split()).casefold() or None
+
+
+last_id = 0
+
+
+def allocate_ids(count=1):
+    # ID в духе Snowflake: миллисекунды от ID_EPOCH_MS, сдвинутые на ID_SEQUENCE_BITS, плюс номер.
+    # Последний выданный ID лежит в ID_STATE_PATH под flock, так что процессы не пересекаются,
+    # а пачка из count ID выдаётся за одну блокировку. ID растут вместе со временем создания.
+    global last_id
+    with open(ID_STATE_PATH, 'a+') as state:
+        if fcntl is not None:
+            fcntl.flock(state, fcntl.LOCK_EX)
+        state.seek(0)
+        try:
+            stored = int(state.read() or 0)
+        except ValueError:
+            stored = 0
+        now = (int(time.time() * 1000) - ID_EPOCH_MS) << ID_SEQUENCE_BITS
+        first = max(last_id + 1, stored + 1, now)
+        last_id = first + count - 1
+        state.seek(0)
+        state.truncate()
+        state.write(str(last_id))
+    return range(first, last_id + 1)
+
+
+id_pool = iter(())
+
+
+def reserve_ids(count):
+    # пакетный режим заранее берёт count ID одной блокировкой, next_id сначала расходует их
+    global id_pool
+    id_pool = iter(allocate_ids(count) if count else ())
+
+
+def next_id():
+    record_id = next(id_pool, None)
+    return record_id if record_id is not None else allocate_ids()[0]
+
+
+class BaseRepository:
+    # общее для хранилищ на JSON-журнале и на SQLite: события слушателей, кэш производных структур
+    def notify(self, event, *args):
+        # слушатель может обрабатывать не все события
+        for listener in self.listeners:
+            handler = getattr(listener, event, None)
+            if handler is not None:
+                handler(self, *args)
+
+    def cached(self, name, builder):
+        # производные структуры (колонки, агрегаты) пересобираются только после изменения данных
+        self.refresh()
+        version, value = self.derived.get(name, (None, None))
+        if version != self.version:
+            value = builder(self)
+            self.derived[name] = (self.version, value)
+        return value
+
+    def get(self, record_id):
+        found = self.find('id', str(record_id))
+        return found[0] if found else None
+
+
+class Repository(BaseRepository):
+    # Данные хранилища держатся в памяти; изменения сразу пишутся в журнал.
+    # Кэш сбрасывается, если снимок или журнал изменил другой процесс (mtime/размер).
+    # Записи лежат в слотах списка; удалённые слоты обнуляются, индексы ссылаются на номера слотов.
+    # Упорядоченные индексы хранят отсортированные пары (ключ, слот) для выборок по диапазону.
+    # Чтение с диска идёт под разделяемой блокировкой *.lock, каждое изменение — под исключительной,
+    # поэтому несколько процессов могут работать с одним каталогом данных.
+    # Слушатели (поисковые индексы, агрегаты) получают события reloaded/added/deleted/updated
+    # и compacted после переписывания снимка.
+    # Если задан record_type, словари из файла превращаются в компактные записи этого класса.
+    def __init__(self, file_path, indexes=None, sorted_indexes=None, record_type=None):
+        self.file_path = file_path
+        self.record_type = record_type
+        self.lock_path = file_path + '.lock'
+        self.lock_depth = 0
+        self.journal = Journal(file_path)
+        self.key_funcs = {'id': lambda record: str(record['id']) if 'id' in record else None}
+        self.key_funcs.update(indexes or {})
+        self.sort_funcs = dict(sorted_indexes or {})
+        self.slots = None
+        self.indexes = {}
+        self.sorted_indexes = {}
+        self.holes = 0
+        self.signature = None
+        self.version = 0
+        self.derived = {}
+        self.listeners = []
+
+    def file_signature(self):
+        signature = []
+        for path in (self.file_path, self.journal.log_path):
+            try:
+                info = os.stat(path)
+                signature.append((info.st_mtime_ns, info.st_size))
+            except FileNotFoundError:
+                signature.append(None)
+        return tuple(signature)
+
+    @contextmanager
+    def locked(self, shared=False):
+        if self.lock_depth or fcntl is None:
+            self.lock_depth += 1
+            try:
+                yield self
+            finally:
+                self.lock_depth -= 1
+            return
+        with open(self.lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+            self.lock_depth += 1
+            try:
+                yield self
+            finally:
+                self.lock_depth -= 1
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def refresh(self):
+        if self.slots is not None and self.file_signature() == self.signature:
+            return
+        with self.locked(shared=True):
+            signature = self.file_signature()
+            records = self.journal.load()
+        if any(record.get('id') is None for record in records):
+            # старые записи без ID (ранние выгрузки финансов) получают ID один раз, снимок переписывается
+            with self.locked():
+                records = self.journal.load()
+                assign_ids(records)
+                self.journal.compact(records)
+                signature = self.file_signature()
+        self.rebuild(records)
+        self.signature = signature
+        self.notify('reloaded')
+
+    def rebuild(self, records):
+        if self.record_type is not None:
+            # замена на месте: словарь освобождается сразу, пик памяти не удваивается
+            from_dict = self.record_type.from_dict
+            for slot, record in enumerate(records):
+                records[slot] = from_dict(record)
+        self.slots = records
+        self.holes = 0
+        self.version += 1
+        self.indexes = {name: {} for name in self.key_funcs}
+        self.sorted_indexes = {name: [] for name in self.sort_funcs}
+        for slot, record in enumerate(records):
+            self.index_record(slot, record, presorted=True)
+        for entries in self.sorted_indexes.values():
+            entries.sort()
+
+    def index_record(self, slot, record, presorted=False):
+        for name, key_func in self.key_funcs.items():
+            key = key_func(record)
+            if key is not None:
+                self.indexes[name].setdefault(key, []).append(slot)
+        for name, key_func in self.sort_funcs.items():
+            key = key_func(record)
+            if key is not None:
+                if presorted:
+                    self.sorted_indexes[name].append((key, slot))
+                else:
+                    insort(self.sorted_indexes[name], (key, slot))
+
+    def unindex_record(self, slot, record):
+        for name, key_func in self.key_funcs.items():
+            key = key_func(record)
+            bucket = self.indexes[name].get(key)
+            if bucket is not None:
+                bucket.remove(slot)
+                if not bucket:
+                    del self.indexes[name][key]
+        for name, key_func in self.sort_funcs.items():
+            key = key_func(record)
+            if key is not None:
+                entries = self.sorted_indexes[name]
+                position = bisect_left(entries, (key, slot))
+                if position < len(entries) and entries[position] == (key, slot):
+                    del entries[position]
+
+    def committed(self):
+        self.version += 1
+        if self.journal.segment is not None:
+            return
+        # записи берутся прямо из слотов: list(self) вызвал бы refresh(), тот увидел бы только что
+        # дописанный журнал и перечитал хранилище, а слушатели учли бы новые записи дважды
+        if self.holes > 1024 and self.holes * 2 > len(self.slots):
+            self.rebuild([record for record in self.slots if record is not None])
+        if self.journal.needs_compaction():
+            self.journal.compact([record for record in self.slots if record is not None])
+            self.notify('compacted')
+        self.signature = self.file_signature()
+
+    def __iter__(self):
+        self.refresh()
+        return (record for record in self.slots if record is not None)
+
+    def __len__(self):
+        self.refresh()
+        return len(self.slots) - self.holes
+
+    def find(self, index, key):
+        self.refresh()
+        return [self.slots[slot] for slot in self.indexes[index].get(key, ())]
+
+    def iter_range(self, index, low, high):
+        self.refresh()
+        entries = self.sorted_indexes[index]
+        start = bisect_left(entries, (low, -1))
+        stop = bisect_right(entries, (high, float('inf')))
+        for position in range(start, stop):
+            yield self.slots[entries[position][1]]
+
+    @contextmanager
+    def transaction(self):
+        if self.journal.segment is not None:
+            yield self
+            return
+        with self.locked():
+            self.refresh()
+            self.journal.begin()
+            try:
+                yield self
+            except BaseException:
+                self.journal.rollback()
+                self.slots = None
+                self.notify('rolledback')
+                raise
+            self.journal.commit()
+            self.committed()
+            self.notify('committed')
+
+    def in_transaction(self):
+        return self.journal.segment is not None
+
+    def ordered(self, index, reverse=False):
+        self.refresh()
+        entries = self.sorted_indexes[index]
+        for key, slot in (reversed(entries) if reverse else entries):
+            yield key, self.slots[slot]
+
+    def iter_find(self, index, key):
+        self.refresh()
+        for slot in self.indexes[index].get(key, ()):
+            yield self.slots[slot]
+
+    def add(self, records):
+        if self.record_type is not None:
+            records = [self.record_type.from_dict(record) for record in records]
+        with self.locked():
+            self.refresh()
+            self.journal.append(records)
+            bulk = len(records) > 1
+            for record in records:
+                self.slots.append(record)
+                self.index_record(len(self.slots) - 1, record, presorted=bulk)
+            if bulk:
+                for entries in self.sorted_indexes.values():
+                    entries.sort()
+            self.committed()
+            self.notify('added', records)
+
+    def delete(self, ids):
+        with self.locked():
+            self.refresh()
+            ids = [record['id'] for record_id in ids for record in self.find('id', str(record_id))]
+            if not ids:
+                return 0
+            self.journal.delete(list(dict.fromkeys(ids)))
+            removed = []
+            for record_id in ids:
+                for slot in list(self.indexes['id'].get(str(record_id), ())):
+                    removed.append(self.slots[slot])
+                    self.unindex_record(slot, self.slots[slot])
+                    self.slots[slot] = None
+            self.holes += len(removed)
+            self.committed()
+            self.notify('deleted', removed)
+            return len(removed)
+
+    def update(self, record, fields):
+        with self.locked():
+            self.refresh()
+            slots = list(self.indexes['id'].get(str(record['id']), ()))
+            if not slots:
+                return
+            self.journal.update(record['id'], fields)
+            for slot in slots:
+                current = self.slots[slot]
+                self.unindex_record(slot, current)
+                current.update(fields)
+                self.index_record(slot, current)
+            self.committed()
+            self.notify('updated', current)
+
+
+COLUMN_TYPES = {'id': 'INTEGER', 'amount': 'REAL'}
+sqlite_connections = {}
+
+
+def sqlite_connect(db_path):
+    connection = sqlite3.connect(db_path, isolation_level=None, check_same_thread=False)
+    connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute(f"PRAGMA synchronous={'FULL' if FSYNC else 'NORMAL'}")
+    return connection
+
+
+def sqlite_connection(db_path):
+    # одно соединение на базу для всех хранилищ процесса
+    if db_path not in sqlite_connections:
+        sqlite_connections[db_path] = sqlite_connect(db_path)
+    return sqlite_connections[db_path]
+
+
+class SQLiteRepository(BaseRepository):
+    # То же API, что у Repository, поверх SQLite: типизированная таблица на хранилище,
+    # ключи индексов (id, дата, категория, дедлайн, телефон...) лежат в столбцах ix_<имя>
+    # с индексами SQLite. Режим WAL. Каждое изменение таблицы увеличивает её счётчик в таблице meta,
+    # так что refresh замечает чужие записи только в своей таблице, а не любые записи в базу.
+    def __init__(self, record_class, db_path, connection=None):
+        self.file_path = record_class.FILE_PATH
+        self.table = os.path.splitext(os.path.basename(record_class.FILE_PATH))[0]
+        self.fields = list(record_class.FIELDS)
+        self.record_type = record_class if issubclass(record_class, Record) else None
+        self.key_funcs = {'id': lambda record: str(record['id']) if 'id' in record else None}
+        self.key_funcs.update(getattr(record_class, 'INDEXES', {}))
+        self.sort_funcs = dict(getattr(record_class, 'SORTED_INDEXES', {}))
+        self.index_funcs = {**self.key_funcs, **self.sort_funcs}
+        self.connection = connection or sqlite_connection(db_path)
+        self.create_schema()
+        columns = ', '.join(f'"{field}"' for field in self.fields)
+        index_columns = ', '.join(f'ix_{name}' for name in self.index_funcs)
+        placeholders = ', '.join('?' for _ in range(len(self.fields) + len(self.index_funcs)))
+        self.select_sql = f'SELECT {columns} FROM {self.table}'
+        self.insert_sql = f'INSERT INTO {self.table} ({columns}, {index_columns}) VALUES ({placeholders})'
+        assignments = ', '.join([f'"{field}" = ?' for field in self.fields] + [f'ix_{name} = ?' for name in self.index_funcs])
+        self.update_sql = f'UPDATE {self.table} SET {assignments} WHERE rowid = ?'
+        self.changes = None
+        self.version = 0
+        self.derived = {}
+        self.listeners = []
+
+    def create_schema(self):
+        self.connection.execute('CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, changes INTEGER NOT NULL)')
+        columns = [f'"{field}" {COLUMN_TYPES.get(field, "TEXT")}' for field in self.fields]
+        columns += [f'ix_{name}' for name in self.index_funcs]
+        self.connection.execute(f'CREATE TABLE IF NOT EXISTS {self.table} (rowid INTEGER PRIMARY KEY, {", ".join(columns)})')
+        existing = {row[1] for row in self.connection.execute(f'PRAGMA table_info({self.table})')}
+        for column in columns:
+            if column.split()[0].strip('"') not in existing:
+                self.connection.execute(f'ALTER TABLE {self.table} ADD COLUMN {column}')
+        for name in self.index_funcs:
+            self.connection.execute(f'CREATE INDEX IF NOT EXISTS {self.table}_ix_{name} ON {self.table} (ix_{name})')
+
+    def record_from_row(self, row):
+        record = {field: value for field, value in zip(self.fields, row) if value is not None}
+        return record if self.record_type is None else self.record_type.from_dict(record)
+
+    def row_values(self, record):
+        return [record.get(field) for field in self.fields] + [key_func(record) for key_func in self.index_funcs.values()]
+
+    def table_changes(self):
+        row = self.connection.execute('SELECT changes FROM meta WHERE name = ?', (self.table,)).fetchone()
+        return row[0] if row else 0
+
+    def bump_changes(self):
+        # вызывается внутри транзакции изменения; собственная запись не должна вызывать reloaded
+        self.connection.execute('INSERT INTO meta (name, changes) VALUES (?, 1) '
+                                'ON CONFLICT (name) DO UPDATE SET changes = changes + 1', (self.table,))
+        self.changes = self.table_changes()
+
+    def refresh(self):
+        changes = self.table_changes()
+        if changes != self.changes:
+            self.changes = changes
+            self.version += 1
+            self.notify('reloaded')
+
+    @contextmanager
+    def transaction(self):
+        # соединение общее для всех таблиц базы, поэтому вложенная транзакция
+        # (в том числе другой таблицы) просто входит во внешнюю
+        if self.connection.in_transaction:
+            yield self
+            return
+        self.refresh()
+        self.connection.execute('BEGIN IMMEDIATE')
+        try:
+            yield self
+        except BaseException:
+            self.connection.execute('ROLLBACK')
+            for repository in repositories.values():
+                if getattr(repository, 'connection', None) is self.connection:
+                    repository.changes = None
+                    repository.notify('rolledback')
+            raise
+        self.connection.execute('COMMIT')
+        self.version += 1
+        self.notify('committed')
+
+    def in_transaction(self):
+        return self.connection.in_transaction
+
+    @contextmanager
+    def locked(self, shared=False):
+        if shared:
+            yield self
+            return
+        with self.transaction():
+            yield self
+
+    def query(self, where='', params=(), order=''):
+        self.refresh()
+        for row in self.connection.execute(f'{self.select_sql} {where} {order}', params):
+            yield self.record_from_row(row)
+
+    def __iter__(self):
+        return self.query(order='ORDER BY rowid')
+
+    def __len__(self):
+        self.refresh()
+        return self.connection.execute(f'SELECT COUNT(*) FROM {self.table}').fetchone()[0]
+
+    def find(self, index, key):
+        return list(self.iter_find(index, key))
+
+    def iter_find(self, index, key):
+        return self.query(f'WHERE ix_{index} = ?', (key,), 'ORDER BY rowid')
+
+    def iter_range(self, index, low, high):
+        return self.query(f'WHERE ix_{index} BETWEEN ? AND ?', (low, high), f'ORDER BY ix_{index}, rowid')
+
+    def ordered(self, index, reverse=False):
+        self.refresh()
+        direction = 'DESC' if reverse else 'ASC'
+        sql = (f'SELECT ix_{index}, {self.select_sql[len("SELECT "):]} WHERE ix_{index} IS NOT NULL '
+               f'ORDER BY ix_{index} {direction}, rowid {direction}')
+        for key, *row in self.connection.execute(sql):
+            yield key, self.record_from_row(row)
+
+    def add(self, records):
+        with self.transaction():
+            self.connection.executemany(self.insert_sql, map(self.row_values, records))
+            self.bump_changes()
+        self.version += 1
+        self.notify('added', records)
+
+    def delete(self, ids):
+        with self.transaction():
+            keys = [str(record_id) for record_id in ids]
+            removed = [record for key in keys for record in self.find('id', key)]
+            if removed:
+                self.connection.executemany(f'DELETE FROM {self.table} WHERE ix_id = ?', [(key,) for key in keys])
+                self.bump_changes()
+        if removed:
+            self.version += 1
+            self.notify('deleted', removed)
+        return len(removed)
+
+    def update(self, record, fields):
+        with self.transaction():
+            rows = self.connection.execute(f'SELECT rowid, {self.select_sql[len("SELECT "):]} WHERE ix_id = ?',
+                                           (str(record['id']),)).fetchall()
+            if not rows:
+                return
+            for rowid, *row in rows:
+                current = self.record_from_row(row)
+                current.update(fields)
+                self.connection.execute(self.update_sql, self.row_values(current) + [rowid])
+            self.bump_changes()
+        record.update(fields)
+        self.version += 1
+        self.notify('updated', record)
+
+
+def migrate_to_sqlite(db_path, csv_files=()):
+    # Однократный перенос JSON-хранилищ (снимок + журнал) и, при желании, CSV-выгрузок в SQLite.
+    # csv_files — пары (класс записи, путь к CSV); строки с уже перенесённым id пропускаются.
+    # Строки без id (выгрузка транзакций) сверяются по остальным полям: каждая уже перенесённая
+    # запись с теми же значениями поглощает одну такую строку, остальные получают новые id.
+    for record_class in (Note, Task, Contact, Finance):
+        repository = SQLiteRepository(record_class, db_path)
+        if len(repository):
+            print(f"Таблица {repository.table} уже заполнена, пропускаем")
+            continue
+        with repository.transaction():
+            records = Journal(record_class.FILE_PATH).load()
+            assign_ids(records)
+            repository.add(records)
+            fields = [field for field in record_class.FIELDS if field != 'id']
+            migrated = {}
+            for record in repository:
+                key = tuple(record.get(field) for field in fields)
+                migrated[key] = migrated.get(key, 0) + 1
+            for csv_class, file_name in csv_files:
+                if csv_class is not record_class:
+                    continue
+                with open(file_name, 'r', newline='', encoding='utf-8') as csv_file:
+                    batch = []
+                    duplicates = 0
+                    for row in csv.DictReader(csv_file):
+                        try:
+                            record = record_class.from_csv_row(row)
+                        except (KeyError, TypeError, ValueError):
+                            continue
+                        key = tuple(record.get(field) for field in fields)
+                        if record['id'] is not None:
+                            if repository.get(record['id']) is None:
+                                batch.append(record)
+                        elif migrated.get(key):
+                            migrated[key] -= 1
+                            duplicates += 1
+                        else:
+                            batch.append(record)
+                        if len(batch) >= IMPORT_BATCH_SIZE:
+                            assign_ids(batch)
+                            repository.add(batch)
+                            batch = []
+                    assign_ids(batch)
+                    repository.add(batch)
+                if duplicates:
+                    print(f"{file_name}: пропущено строк без id, уже перенесённых из JSON: {duplicates}")
+        print(f"{repository.table}: перенесено записей: {len(repository)}")
+
+
+repositories = {}
+
+
+def open_repository(record_class, own_connection=False):
+    # отдельный экземпляр хранилища без слушателей; own_connection — собственное соединение SQLite
+    # для другого потока, которое видит только зафиксированные изменения
+    if STORAGE_BACKEND == 'sqlite':
+        return SQLiteRepository(record_class, SQLITE_PATH, sqlite_connect(SQLITE_PATH) if own_connection else None)
+    return Repository(
+        record_class.FILE_PATH,
+        getattr(record_class, 'INDEXES', None),
+        getattr(record_class, 'SORTED_INDEXES', None),
+        record_class if issubclass(record_class, Record) else None,
+    )
+
+
+def get_repository(record_class):
+    if record_class.FILE_PATH not in repositories:
+        repositories[record_class.FILE_PATH] = open_repository(record_class)
+        for listener_class in getattr(record_class, 'LISTENERS', ()):
+            repositories[record_class.FILE_PATH].listeners.append(listener_class())
+    return repositories[record_class.FILE_PATH]
+
+
+def get_listener(record_class, listener_class):
+    repository = get_repository(record_class)
+    return next(listener for listener in repository.listeners if isinstance(listener, listener_class))
+
+
+def load_data(file_path):
+    return Journal(file_path).load()
 
 
 def save_data(file_path, data):
-    with open(file_path, 'w', encoding='utf-8') as f:
-        json.dump(data, f, ensure_ascii=False, indent=4)
+    Journal(file_path).compact(data)
+    if file_path in repositories:
+        repositories[file_path].slots = None
 
 
 def validate_date(date_string, format_type="%d-%m-%Y"):
@@ -23,17 +1049,279 @@ def validate_date(date_string, format_type="%d-%m-%Y"):
         return False
 
 
-class Note:
+def assign_ids(records):
+    # Строкам без ID (например, старым выгрузкам финансов) ID выдаются одной пачкой.
+    missing = [record for record in records if record.get('id') is None]
+    for record, record_id in zip(missing, allocate_ids(len(missing)) if missing else ()):
+        record['id'] = record_id
+
+
+def import_csv(record_class, file_name):
+    # Потоковый импорт: строки читаются и проверяются пачками по IMPORT_BATCH_SIZE,
+    # всё пишется в один сегмент журнала и фиксируется одним коммитом в конце.
+    # ID из файла не сохраняются: повторный импорт своей же выгрузки иначе дал бы записи с одинаковым ID,
+    # поэтому каждая пачка получает новые ID одной блокировкой.
+    repository = get_repository(record_class)
+    imported = skipped = 0
+    started = time.perf_counter()
+    with open(file_name, 'r', newline='', encoding='utf-8') as csv_file, repository.transaction():
+        batch = []
+        for row in csv.DictReader(csv_file):
+            try:
+                record = record_class.from_csv_row(row)
+            except (KeyError, TypeError, ValueError):
+                skipped += 1
+                continue
+            record['id'] = None
+            batch.append(record)
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                assign_ids(batch)
+                repository.add(batch)
+                imported += len(batch)
+                batch = []
+                elapsed = time.perf_counter() - started
+                print(f"\rИмпортировано строк: {imported} ({imported / elapsed:.0f} строк/с)", end='', flush=True)
+        if batch:
+            assign_ids(batch)
+            repository.add(batch)
+            imported += len(batch)
+    elapsed = time.perf_counter() - started
+    print(f"\rИмпортировано строк: {imported} за {elapsed:.2f} с ({imported / max(elapsed, 1e-9):.0f} строк/с)")
+    return imported, skipped
+
+
+def export_csv(file_name, fieldnames, records):
+    # Потоковая запись кусками по EXPORT_CHUNK_SIZE; имя с окончанием .gz — сжатие gzip.
+    if file_name.endswith('.gz'):
+        csv_file = gzip.open(file_name, 'wt', newline='', encoding='utf-8')
+    else:
+        csv_file = open(file_name, 'w', newline='', encoding='utf-8', buffering=1024 * 1024)
+    exported = 0
+    with csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(fieldnames)
+        records = iter(records)
+        while True:
+            chunk = list(islice(records, EXPORT_CHUNK_SIZE))
+            if not chunk:
+                break
+            writer.writerows(record.row(fieldnames) if isinstance(record, Record)
+                             else [record.get(name, '') for name in fieldnames] for record in chunk)
+            exported += len(chunk)
+    return exported
+
+
+def show_pages(records, render, empty_message):
+    # records — ленивый итератор: с хранилища забирается только текущая страница (и одна вперёд),
+    # каждая страница выводится одной записью в stdout
+    records = iter(records)
+    page = list(islice(records, PAGE_SIZE))
+    if not page:
+        print(empty_message)
+        return
+    number = 1
+    while page:
+        sys.stdout.write(f"--- Страница {number} ---\n" + '\n'.join(map(render, page)) + '\n')
+        sys.stdout.flush()
+        page = list(islice(records, PAGE_SIZE))
+        if not page or input("Enter — следующая страница, q — выход: ").strip().lower() == 'q':
+            break
+        number += 1
+
+
+def select_records(repository, sort_index=None, reverse=False, filter_index=None, filter_key=None):
+    # сортировка идёт по упорядоченному индексу, фильтр — по хеш-индексу; без сортировки
+    # перебирается только корзина фильтра
+    if sort_index is None:
+        if filter_index is None:
+            return iter(repository)
+        return repository.iter_find(filter_index, filter_key)
+    key_func = repository.key_funcs.get(filter_index)
+    return (record for _, record in repository.ordered(sort_index, reverse)
+            if filter_index is None or key_func(record) == filter_key)
+
+
+def ask_export_options(record_class):
+    fieldnames = record_class.FIELDS
+    columns = input(f"Столбцы через запятую ({', '.join(fieldnames)}; Enter — все): ")
+    columns = [column.strip() for column in columns.split(',') if column.strip() in fieldnames] or fieldnames
+    repository = get_repository(record_class)
+    date_field = getattr(record_class, 'DATE_FIELD', None)
+    if date_field is None:
+        return columns, iter(repository)
+    start_date = input("Начальная дата (ДД-ММ-ГГГГ, Enter — без фильтра): ").strip()
+    end_date = input("Конечная дата (ДД-ММ-ГГГГ, Enter — без фильтра): ").strip()
+    if not start_date and not end_date:
+        return columns, iter(repository)
+    low = date_ordinal(start_date) if start_date else 0
+    high = date_ordinal(end_date) if end_date else date.max.toordinal()
+    if low is None or high is None:
+        print("Некорректные даты. Фильтр по дате не применён.")
+        return columns, iter(repository)
+    if date_field in repository.sort_funcs:
+        return columns, repository.iter_range(date_field, low, high)
+    return columns, (record for record in repository
+                     if low <= (date_ordinal(record[date_field][:10]) or -1) <= high)
+
+
+WORD_RE = re.compile(r'\w+')
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+def tokenize(text):
+    return WORD_RE.findall(str(text).casefold().replace('ё', 'е'))
+
+
+class NotesIndex:
+    # Инвертированный индекс по заголовку и тексту заметок с ранжированием BM25.
+    # Векторы терминов хранятся отдельным хранилищем notes.json.idx (снимок + журнал),
+    # поэтому при создании, удалении и импорте заметок индекс обновляется инкрементально.
+    def __init__(self):
+        self.documents = None
+        self.postings = {}
+        self.lengths = {}
+        self.terms = []
+        self.total_length = 0
+        self.documents_version = None
+
+    def open(self, notes):
+        if self.documents is None:
+            self.documents = Repository(notes.file_path + '.idx')
+        self.documents.refresh()
+        if self.documents_version != self.documents.version:
+            self.postings = {}
+            self.lengths = {}
+            self.total_length = 0
+            for document in self.documents:
+                self.index_document(document)
+            self.terms = sorted(self.postings)
+            self.documents_version = self.documents.version
+
+    def index_document(self, document):
+        # возвращает новые термины: список self.terms обновляет вызывающий код
+        doc_id = document['id']
+        new_terms = []
+        for term, frequency in document['terms'].items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = {}
+                new_terms.append(term)
+            postings[doc_id] = frequency
+        self.lengths[doc_id] = document['length']
+        self.total_length += document['length']
+        return new_terms
+
+    def unindex_document(self, document):
+        doc_id = document['id']
+        self.total_length -= self.lengths.pop(doc_id)
+        for term in document['terms']:
+            postings = self.postings[term]
+            del postings[doc_id]
+            if not postings:
+                del self.postings[term]
+                del self.terms[bisect_left(self.terms, term)]
+
+    @staticmethod
+    def make_document(note):
+        tokens = tokenize(note['title']) + tokenize(note['content'])
+        terms = {}
+        for token in tokens:
+            terms[token] = terms.get(token, 0) + 1
+        return {'id': str(note['id']), 'terms': terms, 'length': len(tokens)}
+
+    def store(self, notes):
+        documents = [self.make_document(note) for note in notes]
+        self.remove([document['id'] for document in documents if document['id'] in self.lengths])
+        if documents:
+            self.documents.add(documents)
+            new_terms = [term for document in documents for term in self.index_document(document)]
+            # одиночная заметка вставляет термины в отсортированный список; для пакета новые термины
+            # сортируются и дописываются в конец — timsort сливает два готовых отрезка за линейное время
+            if len(documents) > 1:
+                new_terms.sort()
+                self.terms.extend(new_terms)
+                self.terms.sort()
+            else:
+                for term in new_terms:
+                    insort(self.terms, term)
+            self.documents_version = self.documents.version
+
+    def remove(self, doc_ids):
+        documents = [self.documents.get(doc_id) for doc_id in doc_ids if doc_id in self.lengths]
+        if documents:
+            self.documents.delete([document['id'] for document in documents])
+            for document in documents:
+                self.unindex_document(document)
+            self.documents_version = self.documents.version
+
+    def reloaded(self, notes):
+        # заметки изменены другим процессом или откатом: сверяем индекс с хранилищем
+        self.open(notes)
+        note_ids = {str(note['id']): note for note in notes}
+        self.remove([doc_id for doc_id in self.lengths if doc_id not in note_ids])
+        self.store([note for doc_id, note in note_ids.items() if doc_id not in self.lengths])
+
+    def added(self, notes, records):
+        self.open(notes)
+        self.store(records)
+
+    def deleted(self, notes, records):
+        self.open(notes)
+        self.remove(list({str(record['id']) for record in records}))
+
+    def updated(self, notes, record):
+        self.open(notes)
+        self.store([record])
+
+    def expand(self, token):
+        if not token.endswith('*'):
+            return [token] if token in self.postings else []
+        prefix = token[:-1]
+        start = bisect_left(self.terms, prefix)
+        stop = bisect_left(self.terms, prefix + '\uffff')
+        return self.terms[start:stop]
+
+    def search(self, notes, query, limit=20):
+        notes.refresh()
+        self.open(notes)
+        count = len(self.lengths)
+        if not count:
+            return []
+        average_length = self.total_length / count
+        scores = {}
+        for token in re.findall(r'\w+\*?', query.casefold().replace('ё', 'е')):
+            for term in self.expand(token):
+                postings = self.postings[term]
+                idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+                for doc_id, frequency in postings.items():
+                    norm = BM25_K1 * (1 - BM25_B + BM25_B * self.lengths[doc_id] / average_length)
+                    scores[doc_id] = scores.get(doc_id, 0.0) + idf * frequency * (BM25_K1 + 1) / (frequency + norm)
+        best = heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+        return [(score, note) for doc_id, score in best for note in notes.find('id', doc_id)]
+
+
+class Note(Record):
     FILE_PATH = 'notes.json'
+    FIELDS = ['id', 'title', 'content', 'timestamp']
+    __slots__ = tuple(FIELDS) + ('_extra',)
+    DATE_FIELD = 'timestamp'
+    LISTENERS = [NotesIndex]
 
     def __init__(self, title, content):
-        self.id = int(datetime.now().timestamp())
+        self.id = next_id()
         self.title = title
         self.content = content
         self.timestamp = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
 
-    def to_dict(self):
-        return self.__dict__
+    @staticmethod
+    def from_csv_row(row):
+        return {
+            'id': int(row['id']) if row.get('id') else None,
+            'title': row['title'],
+            'content': row['content'],
+            'timestamp': row['timestamp']
+        }
 
 
 class NotesManager:
@@ -41,37 +1329,54 @@ class NotesManager:
     def create_note():
         title = input("Введите заголовок заметки: ")
         content = input("Введите содержимое заметки: ")
-        note = Note(title, content)
-        notes = load_data(Note.FILE_PATH)
-        notes.append(note.to_dict())
-        save_data(Note.FILE_PATH, notes)
+        get_repository(Note).add([NotesManager.build(title, content)])
         print("Заметка успешно добавлена")
 
+    @staticmethod
+    def build(title, content):
+        return Note(title, content)
+
+    @staticmethod
+    def select():
+        return iter(get_repository(Note))
+
+    @staticmethod
+    def delete(note_id):
+        return get_repository(Note).delete([note_id])
+
+    @staticmethod
+    def search(query, limit=20):
+        return get_listener(Note, NotesIndex).search(get_repository(Note), query, limit)
+
     @staticmethod
     def view_notes():
-        notes = load_data(Note.FILE_PATH)
-        if not notes:
-            print("Нет заметок")
-            return
-        for note in notes:
-            print(f"ID: {note['id']} | Заголовок: {note['title']} | Содержимое заметки: {note['content']} | Дата: {note['timestamp']}")
+        show_pages(get_repository(Note), NotesManager.render, "Нет заметок")
+
+    @staticmethod
+    def render(note):
+        return f"ID: {note['id']} | Заголовок: {note['title']} | Содержимое заметки: {note['content']} | Дата: {note['timestamp']}"
 
     @staticmethod
     def delete_note():
         note_id = input("Введите ID заметки для удаления: ")
-        notes = load_data(Note.FILE_PATH)
-        updated_notes = [note for note in notes if str(note['id']) != note_id]
-        save_data(Note.FILE_PATH, updated_notes)
+        NotesManager.delete(note_id)
         print("Заметка удалена")
 
+    @staticmethod
+    def search_notes():
+        query = input("Введите поисковый запрос (слово* — поиск по началу слова): ")
+        results = NotesManager.search(query)
+        if not results:
+            print("Ничего не найдено")
+            return
+        for score, note in results:
+            print(f"ID: {note['id']} | Заголовок: {note['title']} | Содержимое заметки: {note['content']} | Дата: {note['timestamp']} | Релевантность: {score:.2f}")
+
     @staticmethod
     def export_to_csv():
-        notes = load_data(Note.FILE_PATH)
         file_name = input("Введите имя CSV-файла для импорта: ")
-        with open(file_name, 'w', newline='', encoding='utf-8') as csv_file:
-            writer = csv.DictWriter(csv_file, fieldnames=['id', 'title', 'content', 'timestamp'])
-            writer.writeheader()
-            writer.writerows(notes)
+        columns, notes = ask_export_options(Note)
+        export_csv(file_name, columns, notes)
         print(f"Заметки экспортированы в {file_name}!")
 
     @staticmethod
@@ -81,34 +1386,135 @@ class NotesManager:
             print("Файл не найден.")
             return
 
-        notes = load_data(Note.FILE_PATH)
-        with open(file_name, 'r', encoding='utf-8') as csv_file:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                note = {
-                    'id': int(row['id']),
-                    'title': row['title'],
-                    'content': row['content'],
-                    'timestamp': row['timestamp']
-                }
-                notes.append(note)
-        save_data(Note.FILE_PATH, notes)
+        imported, skipped = import_csv(Note, file_name)
+        if skipped:
+            print(f"Пропущено некорректных строк: {skipped}")
         print("Заметки успешно импортированы!")
 
 
-class Task:
+PRIORITY_RANKS = {'высокий': 0, 'средний': 1, 'низкий': 2}
+
+
+def priority_rank(priority):
+    return PRIORITY_RANKS.get(str(priority).strip().casefold(), len(PRIORITY_RANKS))
+
+
+def deadline_key(record):
+    # ключ очереди дедлайнов: ординал даты * 10 + ранг приоритета; выполненные задачи в очередь не попадают
+    if record['done'] == 'done':
+        return None
+    ordinal = field_ordinal(record, 'due_date')
+    return None if ordinal is None else ordinal * 10 + priority_rank(record['priority'])
+
+
+DEADLINE_MAX = date.max.toordinal() * 10 + 9
+REMINDER_MAX_SLEEP = 3600
+REMINDER_MENU_LIMIT = 5
+
+
+class Task(Record):
     FILE_PATH = 'tasks.json'
+    FIELDS = ['id', 'title', 'description', 'done', 'priority', 'due_date', 'created_at']
+    __slots__ = tuple(FIELDS) + ('_extra',)
+    DATE_FIELDS = ('due_date',)
+    INTERNED = ('done', 'priority')
+    DATE_FIELD = 'due_date'
+    INDEXES = {
+        'done': lambda record: record['done'],
+    }
+    SORTED_INDEXES = {
+        'due_date': lambda record: field_ordinal(record, 'due_date'),
+        'priority': lambda record: priority_rank(record['priority']) * 10 ** 7 + (field_ordinal(record, 'due_date') or 0),
+        'deadline': deadline_key,
+    }
+
     def __init__(self, title, description, done, priority, due_date):
-        self.id = int(datetime.now().timestamp())
+        self.id = next_id()
         self.title = title
         self.description = description
         self.done = done
-        self.priority = priority
-        self.due_date = due_date
+        self.priority = sys.intern(priority)
+        self.due_date = pack_date(due_date)
         self.created_at = datetime.now().strftime("%d-%m-%Y %H:%M:%S")
 
-    def to_dict(self):
-        return self.__dict__
+    @staticmethod
+    def from_csv_row(row):
+        if not validate_date(row['due_date']):
+            raise ValueError(row['due_date'])
+        return {
+            'id': int(row['id']) if row.get('id') else None,
+            'title': row['title'],
+            'description': row['description'],
+            'done': row['done'],
+            'priority': row['priority'],
+            'due_date': row['due_date'],
+            'created_at': row['created_at']
+        }
+
+
+class TaskReminder:
+    # Фоновое напоминание о дедлайнах: поток спит до полуночи ближайшего дедлайна из очереди
+    # (не дольше REMINDER_MAX_SLEEP, чтобы заметить задачи из других процессов) и будится сразу,
+    # когда задачи меняются в этом процессе. Читает собственный экземпляр хранилища
+    # (в SQLite — через своё соединение, без незафиксированных изменений основного потока).
+    # limit ограничивает число напоминаний за одну проверку, остальные сводятся в одну строку,
+    # чтобы накопившиеся просроченные задачи не заваливали меню.
+    def __init__(self, output=print, limit=None):
+        self.output = output
+        self.limit = limit
+        self.tasks = open_repository(Task, own_connection=True)
+        self.changed = threading.Event()
+        self.stopped = False
+        self.reminded = set()
+        self.thread = None
+
+    def start(self, background=True):
+        get_repository(Task).listeners.append(self)
+        if not background:
+            self.run()
+            return
+        self.thread = threading.Thread(target=self.run, name='task-reminder', daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stopped = True
+        self.changed.set()
+        listeners = get_repository(Task).listeners
+        if self in listeners:
+            listeners.remove(self)
+
+    def wake(self, *args):
+        self.changed.set()
+
+    reloaded = added = deleted = updated = committed = wake
+
+    def check(self):
+        # напоминает о наступивших дедлайнах и возвращает число секунд до следующего
+        today = date.today().toordinal()
+        shown = hidden = 0
+        for task in self.tasks.iter_range('deadline', 0, today * 10 + 9):
+            if task['id'] not in self.reminded:
+                self.reminded.add(task['id'])
+                if self.limit is not None and shown >= self.limit:
+                    hidden += 1
+                    continue
+                shown += 1
+                state = "сегодня" if date_ordinal(task['due_date']) == today else "просрочена"
+                self.output(f"Напоминание ({state}): {task['title']} | Приоритет: {task['priority']} | Дедлайн: {task['due_date']}")
+        if hidden:
+            self.output(f"...и ещё задач с наступившим дедлайном: {hidden} (Управление задачами → дедлайны)")
+        upcoming = next(iter(self.tasks.iter_range('deadline', (today + 1) * 10, DEADLINE_MAX)), None)
+        if upcoming is None:
+            return REMINDER_MAX_SLEEP
+        deadline = date.fromordinal(date_ordinal(upcoming['due_date']))
+        delay = (datetime(deadline.year, deadline.month, deadline.day) - datetime.now()).total_seconds()
+        return min(max(delay, 0), REMINDER_MAX_SLEEP)
+
+    def run(self):
+        while not self.stopped:
+            delay = self.check()
+            self.changed.wait(delay)
+            self.changed.clear()
 
 
 class TasksManager:
@@ -119,36 +1525,88 @@ class TasksManager:
         description = input("Введите описание задачи: ")
         prior = input("Выберите приоритет (Высокий/Средний/Низкий): ")
         deadline = input("Введите срок выполнения (формат: DD-MM-YYYY): ")
-        if not validate_date(deadline):
-            print("Некорректная дата. Задача не дабавлена")
+        try:
+            task = TasksManager.build(title, description, prior, deadline)
+        except ValueError as error:
+            print(error)
             return
-        task = Task(title, description, 'not done', prior, deadline)
-        tasks = load_data(Task.FILE_PATH)
-        tasks.append(task.to_dict())
-        save_data(Task.FILE_PATH, tasks)
+        get_repository(Task).add([task])
         print("Задача успешно добавлена")
 
     @staticmethod
-    def view_tasks():
-        tasks = load_data(Task.FILE_PATH)
-        if not tasks:
-            print("Нет задач.")
+    def build(title, description, priority, due_date):
+        if not validate_date(due_date):
+            raise ValueError("Некорректная дата. Задача не дабавлена")
+        return Task(title, description, 'not done', priority, due_date)
+
+    @staticmethod
+    def select(sort_index=None, status=None):
+        return select_records(get_repository(Task), sort_index, filter_index='done' if status else None, filter_key=status)
+
+    @staticmethod
+    def complete(task_id):
+        tasks = get_repository(Task)
+        with tasks.locked():
+            task = tasks.get(task_id)
+            if task is not None:
+                tasks.update(task, {'done': 'done'})
+        return task
+
+    @staticmethod
+    def delete(task_id):
+        return get_repository(Task).delete([task_id])
+
+    @staticmethod
+    def upcoming(limit=10):
+        today = date.today().toordinal()
+        return islice(get_repository(Task).iter_range('deadline', today * 10, DEADLINE_MAX), limit)
+
+    @staticmethod
+    def overdue():
+        today = date.today().toordinal()
+        return get_repository(Task).iter_range('deadline', 0, today * 10 - 1)
+
+    @staticmethod
+    def due_within(days=7):
+        today = date.today().toordinal()
+        return get_repository(Task).iter_range('deadline', today * 10, (today + days) * 10 + 9)
+
+    @staticmethod
+    def view_deadlines():
+        choice = input("1 — ближайшие задачи, 2 — просроченные, 3 — срок в ближайшие 7 дней: ").strip()
+        if choice == '1':
+            try:
+                count = int(input("Сколько задач показать: ").strip() or 10)
+            except ValueError:
+                print("Некорректное число.")
+                return
+            tasks = TasksManager.upcoming(count)
+        elif choice == '2':
+            tasks = TasksManager.overdue()
+        elif choice == '3':
+            tasks = TasksManager.due_within(7)
+        else:
+            print("Некорректный выбор.")
             return
-        for task in tasks:
-            print(f"ID: {task['id']} | Приоритет: {task['priority']} | Описание: {task['description']} | Дедлайн: {task['due_date']} | Создано: {task['created_at']} | Статус задачи: {task['done']}")
+        show_pages(tasks, TasksManager.render, "Нет задач.")
+
+    @staticmethod
+    def view_tasks():
+        sort_index = {'1': 'due_date', '2': 'priority'}.get(
+            input("Сортировка: 1 — по дедлайну, 2 — по приоритету, Enter — по порядку добавления: ").strip())
+        status = {'1': 'not done', '2': 'done'}.get(
+            input("Показать: 1 — невыполненные, 2 — выполненные, Enter — все: ").strip())
+        tasks = TasksManager.select(sort_index, status)
+        show_pages(tasks, TasksManager.render, "Нет задач.")
+
+    @staticmethod
+    def render(task):
+        return f"ID: {task['id']} | Приоритет: {task['priority']} | Описание: {task['description']} | Дедлайн: {task['due_date']} | Создано: {task['created_at']} | Статус задачи: {task['done']}"
 
     @staticmethod
     def mark_task_as_done():
         task_id = input("Введите ID выполненной задачи: ")
-        tasks = load_data(Task.FILE_PATH)
-        task_indicator = False
-        for task in tasks:
-            if str(task['id']) == task_id:
-                task['done'] = 'done'
-                task_indicator = True
-                break
-        if task_indicator:
-            save_data(Task.FILE_PATH, tasks)
+        if TasksManager.complete(task_id) is not None:
             print("Статус задачи изменен")
         else:
             print(f"Задача с ID: {task_id} не найдена")
@@ -156,19 +1614,14 @@ class TasksManager:
     @staticmethod
     def delete_task():
         task_id = input("Введите ID задачи для удаления: ")
-        tasks = load_data(Task.FILE_PATH)
-        updated_tasks = [task for task in tasks if str(task['id']) != task_id]
-        save_data(Task.FILE_PATH, updated_tasks)
+        TasksManager.delete(task_id)
         print("Задача удаленa")
 
     @staticmethod
     def export_to_csv_tasks():
-        tasks = load_data(Task.FILE_PATH)
         file_name = input("Введите имя CSV-файла для импорта: ")
-        with open(file_name, 'w', newline='', encoding='utf-8') as csv_file:
-            writer = csv.DictWriter(csv_file, fieldnames=['id', 'title', 'description', 'done', 'priority', 'due_date', 'created_at'])
-            writer.writeheader()
-            writer.writerows(tasks)
+        columns, tasks = ask_export_options(Task)
+        export_csv(file_name, columns, tasks)
         print(f"Заметки экспортированы в {file_name}!")
 
     @staticmethod
@@ -178,34 +1631,188 @@ class TasksManager:
             print("Файл не найден.")
             return
 
-        tasks = load_data(Task.FILE_PATH)
-        with open(file_name, 'r', encoding='utf-8') as csv_file:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                task = {
-                    'id': int(row['id']),
-                    'title': row['title'],
-                    'description': row['description'],
-                    'done': row['done'],
-                    'priority': row['priority'],
-                    'due_date': row['due_date'],
-                    'created_at': row['created_at']
-                }
-                tasks.append(task)
-        save_data(Task.FILE_PATH, tasks)
+        imported, skipped = import_csv(Task, file_name)
+        if skipped:
+            print(f"Пропущено некорректных строк: {skipped}")
         print("Задачи успешно импортированы!")
 
 
-class Contact:
+def trigrams(text):
+    # двойной пробел в начале: первые буквы слова весят больше, опечатка в середине короткого слова
+    # не обнуляет сходство
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class ContactsIndex:
+    # Поиск контактов: префиксы имён, телефонов (только цифры) и email ищутся бисекцией
+    # по отсортированному массиву пар (ключ, id) — плоскому представлению префиксного дерева;
+    # телефон индексируется и без кода страны, чтобы находиться по первым цифрам номера.
+    # Опечатки в именах и email прощаются через индекс триграмм слов: сходство каждого слова
+    # запроса с лучшим словом контакта считается по коэффициенту Дайса и усредняется по запросу.
+    # Порог подобран так, что одна пропущенная или заменённая буква в фамилии ещё находится.
+    # Обе структуры строятся в памяти при первом запросе, которому они нужны,
+    # и дальше поддерживаются инкрементально.
+    FUZZY_THRESHOLD = 0.6
+
+    def __init__(self):
+        self.keys = None
+        self.trigrams = None
+        self.words = None
+
+    @staticmethod
+    def prefix_keys(contact):
+        name = (normalize_name(contact['name']) or '').replace('ё', 'е')
+        keys = set(name.split())
+        if name:
+            keys.add(name)
+        digits = re.sub(r'\D', '', str(contact['phone']))
+        phone = normalize_phone(digits)
+        for key in (digits, phone, phone[1:] if phone and len(phone) == 11 and phone[0] == '7' else None):
+            if key:
+                keys.add(key)
+        email = str(contact['email']).strip().casefold()
+        if email:
+            keys.add(email)
+        return keys
+
+    @staticmethod
+    def contact_words(contact):
+        words = set((normalize_name(contact['name']) or '').replace('ё', 'е').split())
+        words.add(str(contact['email']).strip().casefold().split('@')[0])
+        words.discard('')
+        return words
+
+    def index_words(self, contact):
+        contact_id = str(contact['id'])
+        for word in self.contact_words(contact):
+            if word not in self.words:
+                self.words[word] = set()
+                for gram in trigrams(word):
+                    self.trigrams.setdefault(gram, set()).add(word)
+            self.words[word].add(contact_id)
+
+    def insert(self, contacts, presorted=False):
+        for contact in contacts:
+            contact_id = str(contact['id'])
+            if self.keys is not None:
+                for key in self.prefix_keys(contact):
+                    if presorted:
+                        self.keys.append((key, contact_id))
+                    else:
+                        insort(self.keys, (key, contact_id))
+            if self.words is not None:
+                self.index_words(contact)
+        if presorted and self.keys is not None:
+            self.keys.sort()
+
+    def remove(self, contacts):
+        for contact in contacts:
+            contact_id = str(contact['id'])
+            if self.keys is not None:
+                for key in self.prefix_keys(contact):
+                    position = bisect_left(self.keys, (key, contact_id))
+                    if position < len(self.keys) and self.keys[position] == (key, contact_id):
+                        del self.keys[position]
+            if self.words is not None:
+                for word in self.contact_words(contact):
+                    owners = self.words.get(word)
+                    if owners is None:
+                        continue
+                    owners.discard(contact_id)
+                    if not owners:
+                        del self.words[word]
+                        for gram in trigrams(word):
+                            self.trigrams[gram].discard(word)
+
+    def reloaded(self, contacts):
+        self.keys = self.trigrams = self.words = None
+
+    def added(self, contacts, records):
+        self.insert(records, presorted=len(records) > 1)
+
+    def deleted(self, contacts, records):
+        self.remove(records)
+
+    def updated(self, contacts, record):
+        self.keys = self.trigrams = self.words = None
+
+    def search(self, contacts, query):
+        contacts.refresh()
+        text = ' '.join(query.casefold().replace('ё', 'е').split())
+        if not text:
+            return []
+        scores = {}
+        for contact in contacts.find('name', normalize_name(query)) + contacts.find('phone', normalize_phone(query)):
+            scores[str(contact['id'])] = 3.0
+        is_phone = not any(ch.isalpha() for ch in text)
+        prefix = re.sub(r'\D', '', text) if is_phone else text
+        prefixes = {prefix} if prefix else set()
+        if is_phone and prefix.startswith('8'):
+            # 8 в начале набранного номера — то же, что +7
+            prefixes.add('7' + prefix[1:])
+        if prefixes and self.keys is None:
+            self.keys = [(key, str(contact['id'])) for contact in contacts for key in self.prefix_keys(contact)]
+            self.keys.sort()
+        for prefix in prefixes:
+            for position in range(bisect_left(self.keys, (prefix, '')), len(self.keys)):
+                key, contact_id = self.keys[position]
+                if not key.startswith(prefix):
+                    break
+                scores[contact_id] = max(scores.get(contact_id, 0.0), 2.0 + len(prefix) / len(key))
+        if not is_phone and len(text) >= 4:
+            if self.words is None:
+                self.trigrams, self.words = {}, {}
+                for contact in contacts:
+                    self.index_words(contact)
+            query_words = text.split()
+            totals = {}
+            for query_word in query_words:
+                grams = trigrams(query_word)
+                overlaps = {}
+                for gram in grams:
+                    for word in self.trigrams.get(gram, ()):
+                        overlaps[word] = overlaps.get(word, 0) + 1
+                best = {}
+                for word, overlap in overlaps.items():
+                    similarity = 2 * overlap / (len(grams) + len(trigrams(word)))
+                    for contact_id in self.words[word]:
+                        if similarity > best.get(contact_id, 0.0):
+                            best[contact_id] = similarity
+                for contact_id, similarity in best.items():
+                    totals[contact_id] = totals.get(contact_id, 0.0) + similarity
+            for contact_id, total in totals.items():
+                similarity = total / len(query_words)
+                if similarity >= self.FUZZY_THRESHOLD and contact_id not in scores:
+                    scores[contact_id] = similarity
+        ranked = sorted(scores.items(), key=lambda item: -item[1])
+        return [contact for contact_id, _ in ranked for contact in contacts.find('id', contact_id)]
+
+
+class Contact(Record):
     FILE_PATH = 'contacts.json'
+    FIELDS = ['id', 'name', 'phone', 'email']
+    __slots__ = tuple(FIELDS) + ('_extra',)
+    LISTENERS = [ContactsIndex]
+    INDEXES = {
+        'name': lambda record: normalize_name(record['name']),
+        'phone': lambda record: normalize_phone(record['phone']),
+    }
+
     def __init__(self, name, phone, email):
-        self.id = int(datetime.now().timestamp())
+        self.id = next_id()
         self.name = name
         self.phone = phone
         self.email = email
 
-    def to_dict(self):
-        return self.__dict__
+    @staticmethod
+    def from_csv_row(row):
+        return {
+            'id': int(row['id']) if row.get('id') else None,
+            'name': row['name'],
+            'phone': row['phone'],
+            'email': row['email']
+        }
 
 
 class ContactsManager:
@@ -214,44 +1821,51 @@ class ContactsManager:
         name = input("Введите имя: ")
         phone = input("Введите номер телефона ")
         email = input("Введите email: ")
-        contact = Contact(name, phone, email)
-        contacts = load_data(Contact.FILE_PATH)
-        contacts.append(contact.to_dict())
-        save_data(Contact.FILE_PATH, contacts)
+        get_repository(Contact).add([ContactsManager.build(name, phone, email)])
         print("Контакт успешно добавлен")
 
+    @staticmethod
+    def build(name, phone, email):
+        return Contact(name, phone, email)
+
+    @staticmethod
+    def select():
+        return iter(get_repository(Contact))
+
+    @staticmethod
+    def delete(contact_id):
+        return get_repository(Contact).delete([contact_id])
+
+    @staticmethod
+    def search(query):
+        return get_listener(Contact, ContactsIndex).search(get_repository(Contact), query)
+
     @staticmethod
     def search_contact():
-        contacts = load_data(Contact.FILE_PATH)
+        contacts = get_repository(Contact)
         if not contacts:
             print("Нет контактов")
             return
-        search_contact = input("Введите имя ИЛИ номер телефона: ")
-        indicator = False
-        for contact in contacts:
-            if contact['name'] == search_contact or contact['phone'] == search_contact:
+        search_contact = input("Введите имя, телефон или email (можно начало или с опечаткой): ")
+        found = ContactsManager.search(search_contact)
+        if found:
+            print(f"Найдено контактов: {len(found)}")
+            for contact in found:
                 print(f"Контакт успешно найден! ID: {contact['id']} | Имя: {contact['name']} | Телефон: {contact['phone']} | Email: {contact['email']}")
-                indicator = True
-                break
-        if not indicator:
+        else:
             print(f"Контакт {search_contact} не найден!")
 
     @staticmethod
     def delete_contact():
         contact_id = input("Введите ID контакта для удаления: ")
-        contacts = load_data(Contact.FILE_PATH)
-        updated_contacts = [contact for contact in contacts if str(contact['id']) != contact_id]
-        save_data(Contact.FILE_PATH, updated_contacts)
+        ContactsManager.delete(contact_id)
         print("Контакт удалён")
 
     @staticmethod
     def export_to_csv_contacts():
-        contacts = load_data(Contact.FILE_PATH)
         file_name = input("Введите имя CSV-файла для импорта: ")
-        with open(file_name, 'w', newline='', encoding='utf-8') as csv_file:
-            writer = csv.DictWriter(csv_file, fieldnames=['id', 'name', 'phone', 'email'])
-            writer.writeheader()
-            writer.writerows(contacts)
+        columns, contacts = ask_export_options(Contact)
+        export_csv(file_name, columns, contacts)
         print(f"Заметки экспортированы в {file_name}!")
 
     @staticmethod
@@ -261,31 +1875,365 @@ class ContactsManager:
             print("Файл не найден.")
             return
 
-        contacts = load_data(Contact.FILE_PATH)
-        with open(file_name, 'r', encoding='utf-8') as csv_file:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                contact = {
-                    'id': int(row['id']),
-                    'name': row['name'],
-                    'phone': row['phone'],
-                    'email': row['email']
-                }
-                contacts.append(contact)
-        save_data(Contact.FILE_PATH, contacts)
+        imported, skipped = import_csv(Contact, file_name)
+        if skipped:
+            print(f"Пропущено некорректных строк: {skipped}")
         print("Контакты успешно импортированы!")
 
 
-class Finance:
+class FinanceAggregates:
+    # Материализованные агрегаты по транзакциям: суммы по дням и категориям, общие итоги.
+    # Обновляются при добавлении и удалении. На диске: снимок finance.json.agg и журнал
+    # приращений finance.json.agg.log; каждая строка журнала связывает подпись файлов
+    # хранилища до и после изменения. Снимок переписывается только при компактификации
+    # хранилища или после полного пересчёта. Отчёт за период строится по колонкам агрегатов
+    # (AggregateColumns), текущий баланс — сразу из итогов.
+    def __init__(self):
+        self.days = None
+        self.totals = [0.0, 0.0, 0]
+        self.columns = None
+        self.stamp = None
+        self.delta = None
+        self.dirty = False
+
+    @staticmethod
+    def stamp_of(finance):
+        # для SQLite агрегаты держатся только в памяти и пересчитываются при внешних изменениях
+        return str(finance.file_signature()) if hasattr(finance, 'file_signature') else None
+
+    def merge(self, ordinal, category, income, expenses, count):
+        day = self.days.setdefault(ordinal, {})
+        totals = day.setdefault(category, [0.0, 0.0, 0])
+        totals[0] += income
+        totals[1] += expenses
+        totals[2] += count
+        self.totals[0] += income
+        self.totals[1] += expenses
+        self.totals[2] += count
+        if not totals[2]:
+            del day[category]
+            if not day:
+                del self.days[ordinal]
+
+    def apply(self, records, sign):
+        for record in records:
+            ordinal = field_ordinal(record, 'date')
+            if ordinal is None:
+                continue
+            amount = float(record['amount'])
+            income, expenses = (amount * sign, 0.0) if amount > 0 else (0.0, -amount * sign)
+            self.merge(ordinal, record['category'], income, expenses, sign)
+            if self.delta is not None:
+                totals = self.delta.setdefault((ordinal, record['category']), [0.0, 0.0, 0])
+                totals[0] += income
+                totals[1] += expenses
+                totals[2] += sign
+        self.columns = None
+
+    def rebuild(self, finance):
+        self.days = {}
+        self.totals = [0.0, 0.0, 0]
+        self.delta = None
+        self.apply(finance, 1)
+
+    def load(self, stamp):
+        try:
+            data = read_snapshot(finance_aggregates_path())
+        except (OSError, ValueError):
+            return False
+        if not isinstance(data, dict):
+            return False
+        self.days = {}
+        self.totals = [0.0, 0.0, 0]
+        for row in data['days']:
+            self.merge(*row)
+        current = data.get('stamp')
+        log_path = finance_aggregates_path() + JOURNAL_SUFFIX
+        if os.path.exists(log_path):
+            with open(log_path, 'r', encoding='utf-8') as log_file:
+                for line in log_file:
+                    try:
+                        entry = loads_line(line)
+                    except ValueError:
+                        break
+                    if entry['from'] != current:
+                        break
+                    for row in entry['days']:
+                        self.merge(*row)
+                    current = entry['stamp']
+        if current != stamp:
+            self.days = None
+            return False
+        self.columns = None
+        self.stamp = stamp
+        self.delta = {}
+        return True
+
+    def save(self, finance):
+        if finance.in_transaction():
+            self.dirty = True
+            return
+        self.dirty = False
+        stamp = self.stamp_of(finance)
+        if stamp is None:
+            self.delta = {}
+            return
+        path = finance_aggregates_path()
+        if self.delta is None or self.stamp is None:
+            rows = [[ordinal, category, *totals] for ordinal, day in self.days.items() for category, totals in day.items()]
+            write_snapshot(path, {'stamp': stamp, 'days': rows}, 'compact')
+            if os.path.exists(path + JOURNAL_SUFFIX):
+                os.remove(path + JOURNAL_SUFFIX)
+        elif self.delta:
+            # агрегаты производны от журнала: без fsync, оборванная строка лишь вызовет пересчёт
+            rows = [[ordinal, category, *totals] for (ordinal, category), totals in self.delta.items()]
+            with open(path + JOURNAL_SUFFIX, 'a', encoding='utf-8') as log_file:
+                log_file.write(dumps_line({'from': self.stamp, 'stamp': stamp, 'days': rows}))
+        self.stamp = stamp
+        self.delta = {}
+
+    def reloaded(self, finance):
+        stamp = self.stamp_of(finance)
+        if stamp is None or not self.load(stamp):
+            self.rebuild(finance)
+            self.save(finance)
+
+    def added(self, finance, records):
+        if self.days is not None:
+            self.apply(records, 1)
+            self.save(finance)
+
+    def deleted(self, finance, records):
+        if self.days is not None:
+            self.apply(records, -1)
+            self.save(finance)
+
+    def updated(self, finance, record):
+        self.rebuild(finance)
+        self.save(finance)
+
+    def compacted(self, finance):
+        # следующее сохранение перепишет снимок агрегатов и очистит их журнал
+        self.delta = None
+
+    def committed(self, finance):
+        if self.dirty:
+            self.save(finance)
+
+    def rolledback(self, finance):
+        self.days = None
+        self.stamp = None
+        self.delta = None
+        self.dirty = False
+
+    def ensure(self, finance):
+        # актуальные агрегаты читаются из файла без загрузки самих транзакций
+        stamp = self.stamp_of(finance)
+        if stamp is None or finance.in_transaction():
+            finance.refresh()
+            if self.days is None:
+                self.rebuild(finance)
+            return
+        if stamp == self.stamp and self.days is not None:
+            return
+        with finance.locked(shared=True):
+            if not self.load(self.stamp_of(finance)):
+                finance.refresh()
+                if self.days is None or self.stamp != self.stamp_of(finance):
+                    self.rebuild(finance)
+                    self.save(finance)
+
+    def report_columns(self):
+        if self.columns is None:
+            self.columns = AggregateColumns(self.days)
+        return self.columns
+
+    def balance(self, finance):
+        self.ensure(finance)
+        income, expenses, count = self.totals
+        return {'income': income, 'expenses': expenses, 'balance': income - expenses, 'transactions': count}
+
+    def report(self, finance, start, end, period=None):
+        self.ensure(finance)
+        return self.report_columns().report(start, end, period)
+
+
+def finance_aggregates_path():
+    return Finance.FILE_PATH + '.agg'
+
+
+class Finance(Record):
     FILE_PATH = 'finance.json'
+    FIELDS = ['id', 'description', 'amount', 'date', 'category']
+    __slots__ = tuple(FIELDS) + ('_extra',)
+    DATE_FIELDS = ('date',)
+    # описания транзакций часто повторяются («кофе», «такси»), одинаковые хранятся одной строкой
+    INTERNED = ('category', 'description')
+    DATE_FIELD = 'date'
+    LISTENERS = [FinanceAggregates]
+    INDEXES = {
+        'category': lambda record: record['category'],
+    }
+    SORTED_INDEXES = {
+        'date': lambda record: field_ordinal(record, 'date'),
+        'amount': lambda record: float(record['amount']),
+    }
+
     def __init__(self, description, amount, date, category):
+        self.id = next_id()
         self.description = description
         self.amount = amount
-        self.date = date
-        self.category = category
+        self.date = pack_date(date)
+        self.category = sys.intern(category)
+
+    @staticmethod
+    def from_csv_row(row):
+        if not validate_date(row['date']):
+            raise ValueError(row['date'])
+        return {
+            'id': int(row['id']) if row.get('id') else None,
+            'description': row['description'],
+            'amount': float(row['amount']),
+            'date': row['date'],
+            'category': row['category']
+        }
+
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+
+def period_key(period, ordinal):
+    if period == 'month':
+        day = date.fromordinal(ordinal)
+        return (day.year - 1970) * 12 + day.month - 1
+    return (ordinal - 1) // 7
+
+
+def period_label(period, key):
+    if period == 'month':
+        return f"{key % 12 + 1:02d}-{1970 + key // 12}"
+    return date.fromordinal(key * 7 + 1).strftime("%d-%m-%Y")
+
+
+class AggregateColumns:
+    # Колоночное представление агрегатов в порядке дат: ординал дня, код категории, доход и расход
+    # по каждой паре (день, категория) и префиксные суммы. С numpy итоги, разбивка по категориям
+    # и группировка по месяцам/неделям считаются векторными свёртками, без него — одним проходом.
+    # Строк столько, сколько пар (день, категория), а не транзакций, поэтому отчёт не зависит от объёма журнала.
+    def __init__(self, days):
+        self.categories = []
+        category_codes = {}
+        ordinals, codes, income, expenses = [], [], [], []
+        for ordinal in sorted(days):
+            for category, totals in days[ordinal].items():
+                code = category_codes.get(category)
+                if code is None:
+                    code = category_codes[category] = len(self.categories)
+                    self.categories.append(category)
+                ordinals.append(ordinal)
+                codes.append(code)
+                income.append(totals[0])
+                expenses.append(totals[1])
+        if np is not None:
+            self.ordinals = np.array(ordinals, dtype=np.int32)
+            self.codes = np.array(codes, dtype=np.int32)
+            self.income = np.array(income, dtype=np.float64)
+            self.expenses = np.array(expenses, dtype=np.float64)
+            self.income_sums = np.concatenate(([0.0], np.cumsum(self.income)))
+            self.expense_sums = np.concatenate(([0.0], np.cumsum(self.expenses)))
+        else:
+            self.ordinals, self.codes, self.income, self.expenses = ordinals, codes, income, expenses
+            self.income_sums = [0.0, *accumulate(income)]
+            self.expense_sums = [0.0, *accumulate(expenses)]
+
+    def span(self, start, end):
+        if np is not None:
+            return int(np.searchsorted(self.ordinals, start, 'left')), int(np.searchsorted(self.ordinals, end, 'right'))
+        return bisect_left(self.ordinals, start), bisect_right(self.ordinals, end)
+
+    @staticmethod
+    def period_keys(period, ordinals):
+        if period == 'month':
+            return (ordinals - EPOCH_ORDINAL).astype('datetime64[D]').astype('datetime64[M]').astype(np.int64)
+        return (ordinals.astype(np.int64) - 1) // 7
+
+    def report(self, start, end, period=None):
+        low, high = self.span(start, end)
+        if low == high:
+            return None
+        if np is None:
+            return self.report_python(low, high, period)
+        codes = self.codes[low:high]
+        income, expenses = self.income[low:high], self.expenses[low:high]
+        by_category = np.bincount(codes, weights=income - expenses, minlength=len(self.categories))
+        result = {
+            'income': float(self.income_sums[high] - self.income_sums[low]),
+            'expenses': float(self.expense_sums[high] - self.expense_sums[low]),
+            'categories': {self.categories[code]: float(by_category[code]) for code in np.unique(codes)},
+            'periods': [],
+        }
+        if period:
+            keys, groups = np.unique(self.period_keys(period, self.ordinals[low:high]), return_inverse=True)
+            period_income = np.bincount(groups, weights=income, minlength=len(keys))
+            period_expenses = np.bincount(groups, weights=expenses, minlength=len(keys))
+            result['periods'] = [(period_label(period, int(key)), float(period_income[i]), float(period_expenses[i]))
+                                 for i, key in enumerate(keys)]
+        return result
+
+    def report_python(self, low, high, period=None):
+        categories = {}
+        periods = {}
+        for i in range(low, high):
+            category = self.categories[self.codes[i]]
+            categories[category] = categories.get(category, 0.0) + self.income[i] - self.expenses[i]
+            if period:
+                totals = periods.setdefault(period_key(period, self.ordinals[i]), [0.0, 0.0])
+                totals[0] += self.income[i]
+                totals[1] += self.expenses[i]
+        return {
+            'income': self.income_sums[high] - self.income_sums[low],
+            'expenses': self.expense_sums[high] - self.expense_sums[low],
+            'categories': categories,
+            'periods': [(period_label(period, key), totals[0], totals[1]) for key, totals in sorted(periods.items())],
+        }
+
+
+class FinanceColumns:
+    # Колоночное представление журнала в порядке дат: ординалы дат и суммы.
+    # С numpy это массивы для векторных расчётов «что если», без него — обычные списки.
+    def __init__(self, repository):
+        dates, amounts = [], []
+        for ordinal, record in repository.ordered('date'):
+            dates.append(ordinal)
+            amounts.append(float(record['amount']))
+        if np is not None:
+            self.dates = np.array(dates, dtype=np.int32)
+            self.amounts = np.array(amounts, dtype=np.float64)
+            # колонки закэшированы в хранилище: запрет записи защищает их от вычислений «что если»
+            self.dates.flags.writeable = False
+            self.amounts.flags.writeable = False
+        else:
+            self.dates, self.amounts = dates, amounts
+
+    @staticmethod
+    def of(repository):
+        return repository.cached('columns', FinanceColumns)
+
+    def span(self, start, end):
+        if np is not None:
+            return int(np.searchsorted(self.dates, start, 'left')), int(np.searchsorted(self.dates, end, 'right'))
+        return bisect_left(self.dates, start), bisect_right(self.dates, end)
+
+
+def amount_totals(amounts):
+    if np is not None:
+        amounts = np.asarray(amounts, dtype=np.float64)
+        income, expenses = float(amounts[amounts > 0].sum()), float((-amounts[amounts < 0]).sum())
+    else:
+        income = float(sum(amount for amount in amounts if amount > 0))
+        expenses = float(sum(-amount for amount in amounts if amount < 0))
+    return {'income': income, 'expenses': expenses, 'balance': income - expenses}
 
-    def to_dict(self):
-        return self.__dict__
 
 class FinanceManager:
 
@@ -295,32 +2243,43 @@ class FinanceManager:
         amount = float(input("Введите сумму транзакции: "))
         date = input("Введите дату (формат: DD-MM-YYYY): ")
         category = input('Введите категорию операции (например, "Еда", "Транспорт", "Зарплата"): ')
-        transaction = Finance(description, amount, date, category)
-        if not validate_date(date):
-            print("Некорректная дата. Транзакция не добавлена")
+        try:
+            transaction = FinanceManager.build(description, amount, date, category)
+        except ValueError as error:
+            print(error)
             return
-        transactions = load_data(Finance.FILE_PATH)
-        transactions.append(transaction.to_dict())
-        save_data(Finance.FILE_PATH, transactions)
+        get_repository(Finance).add([transaction])
         print("Транзакция добавлена")
 
+    @staticmethod
+    def build(description, amount, date, category):
+        if not validate_date(date):
+            raise ValueError("Некорректная дата. Транзакция не добавлена")
+        return Finance(description, float(amount), date, category)
+
+    @staticmethod
+    def select(sort_index=None, reverse=False, category=None):
+        return select_records(get_repository(Finance), sort_index, reverse, 'category' if category else None, category)
+
     @staticmethod
     def view_transactions():
-        transactions = load_data(Finance.FILE_PATH)
-        if not transactions:
-            print("Нет транзакций.")
-            return
-        for transaction in transactions:
-            print(f"Описание: {transaction['description']} | Сумма: {transaction['amount']} | Дата: {transaction['date']} | Категория: {transaction['category']}")
+        sort_choice = input("Сортировка: 1 — по дате, 2 — по дате (новые сначала), 3 — по сумме, "
+                            "4 — по сумме (крупные сначала), Enter — по порядку добавления: ").strip()
+        sort_index, reverse = {'1': ('date', False), '2': ('date', True),
+                               '3': ('amount', False), '4': ('amount', True)}.get(sort_choice, (None, False))
+        category = input("Категория (Enter — все): ").strip()
+        transactions = FinanceManager.select(sort_index, reverse, category)
+        show_pages(transactions, FinanceManager.render, "Нет транзакций.")
+
+    @staticmethod
+    def render(transaction):
+        return f"Описание: {transaction['description']} | Сумма: {transaction['amount']} | Дата: {transaction['date']} | Категория: {transaction['category']}"
 
     @staticmethod
     def export_to_csv_finance():
-        transactions = load_data(Finance.FILE_PATH)
         file_name = input("Введите имя CSV-файла для импорта: ")
-        with open(file_name, 'w', newline='', encoding='utf-8') as csv_file:
-            writer = csv.DictWriter(csv_file, fieldnames=['description', 'amount', 'date', 'category'])
-            writer.writeheader()
-            writer.writerows(transactions)
+        columns, transactions = ask_export_options(Finance)
+        export_csv(file_name, columns, transactions)
         print(f"Заметки экспортированы в {file_name}!")
 
     @staticmethod
@@ -330,20 +2289,55 @@ class FinanceManager:
             print("Файл не найден.")
             return
 
-        transactions = load_data(Finance.FILE_PATH)
-        with open(file_name, 'r', encoding='utf-8') as csv_file:
-            reader = csv.DictReader(csv_file)
-            for row in reader:
-                transaction = {
-                    'description': row['description'],
-                    'amount': float(row['amount']),
-                    'date': row['date'],
-                    'category': row['category']
-                }
-                transactions.append(transaction)
-        save_data(Finance.FILE_PATH, transactions)
+        imported, skipped = import_csv(Finance, file_name)
+        if skipped:
+            print(f"Пропущено некорректных строк: {skipped}")
         print("Транзакции успешно импортированы!")
 
+    @staticmethod
+    def report(start_date, end_date, period=None):
+        if not (validate_date(start_date) and validate_date(end_date)):
+            raise ValueError("Некорректные даты.")
+        report = get_listener(Finance, FinanceAggregates).report(
+            get_repository(Finance), date_ordinal(start_date), date_ordinal(end_date), period)
+        if report is not None:
+            report['balance'] = report['income'] - report['expenses']
+        return report
+
+    @staticmethod
+    def balance():
+        return get_listener(Finance, FinanceAggregates).balance(get_repository(Finance))
+
+    @staticmethod
+    def what_if(expression, start_date=None, end_date=None):
+        # формула применяется сразу ко всем суммам за период (переменная amount)
+        low = date_ordinal(start_date) if start_date else 0
+        high = date_ordinal(end_date) if end_date else date.max.toordinal()
+        if low is None or high is None:
+            raise ValueError("Некорректные даты.")
+        columns = FinanceColumns.of(get_repository(Finance))
+        start, stop = columns.span(low, high)
+        amounts = columns.amounts[start:stop]
+        projected = Calculator.apply(expression, {'amount': amounts})
+        if np is not None:
+            projected = np.broadcast_to(projected, amounts.shape)
+        return {'transactions': stop - start, 'before': amount_totals(amounts), 'after': amount_totals(projected)}
+
+    @staticmethod
+    def what_if_report():
+        expression = input("Формула для каждой суммы (переменная amount), например amount * 1.1: ")
+        start_date = input("Начальная дата (ДД-ММ-ГГГГ, Enter — без фильтра): ").strip()
+        end_date = input("Конечная дата (ДД-ММ-ГГГГ, Enter — без фильтра): ").strip()
+        try:
+            result = FinanceManager.what_if(expression, start_date, end_date)
+        except Exception as e:
+            print(f"Ошибка вычисления: {e}")
+            return
+        print(f"Транзакций в расчёте: {result['transactions']}")
+        for label, key in (("Сейчас", 'before'), ("По формуле", 'after')):
+            totals = result[key]
+            print(f"{label}: доход {totals['income']:.2f} руб., расходы {totals['expenses']:.2f} руб., баланс {totals['balance']:.2f} руб.")
+
     @staticmethod
     def generate_report():
         start_date = input("Введите начальную дату (ДД-ММ-ГГГГ): ")
@@ -353,47 +2347,178 @@ class FinanceManager:
             print("Некорректные даты.")
             return
 
-        transactions = load_data(Finance.FILE_PATH)
-        filtered_transactions = [
-            t for t in transactions
-            if start_date <= t['date'] <= end_date
-        ]
+        period = {'1': 'month', '2': 'week'}.get(input("Группировка: 1 — по месяцам, 2 — по неделям, Enter — без группировки: ").strip())
 
-        if not filtered_transactions:
+        report = FinanceManager.report(start_date, end_date, period)
+        if report is None:
             print("Нет транзакций за указанный период.")
             return
 
-        total_income = sum(t['amount'] for t in filtered_transactions if t['amount'] > 0)
-        total_expenses = sum(abs(t['amount']) for t in filtered_transactions if t['amount'] < 0)
-        balance = total_income - total_expenses
+        total_income = report['income']
+        total_expenses = report['expenses']
+        balance = report['balance']
 
         print(f"Финансовый отчёт за период с {start_date} по {end_date}:")
         print(f"- Общий доход: {total_income:.2f} руб.")
         print(f"- Общие расходы: {total_expenses:.2f} руб.")
         print(f"- Баланс: {balance:.2f} руб.")
+        print("По категориям:")
+        for category, total in sorted(report['categories'].items(), key=lambda item: item[1]):
+            print(f"- {category}: {total:.2f} руб.")
+        if report['periods']:
+            print("По периодам:")
+            for label, income, expenses in report['periods']:
+                print(f"- {label}: доход {income:.2f} руб., расходы {expenses:.2f} руб.")
 
         report_file = f"report_{start_date}_{end_date}.csv"
-        with open(report_file, 'w', newline='', encoding='utf-8') as csv_file:
-            writer = csv.DictWriter(csv_file, fieldnames=['description', 'amount', 'date', 'category'])
-            writer.writeheader()
-            writer.writerows(filtered_transactions)
+        filtered_transactions = get_repository(Finance).iter_range('date', date_ordinal(start_date), date_ordinal(end_date))
+        export_csv(report_file, Finance.FIELDS, filtered_transactions)
 
         print(f"Подробная информация сохранена в файле {report_file}.")
 
 
+# результат степени должен выводиться: int → str ограничен sys.get_int_max_str_digits() (4300 цифр ≈ 14000 бит)
+MAX_STR_DIGITS = (sys.get_int_max_str_digits() if hasattr(sys, 'get_int_max_str_digits') else 0) or 4300
+MAX_POWER_BITS = int((MAX_STR_DIGITS - 1) / math.log10(2))
+CALC_FUNCTIONS = {
+    'abs': abs, 'round': round, 'min': min, 'max': max,
+    'sqrt': math.sqrt, 'log': math.log, 'exp': math.exp,
+}
+
+
+# Векторные аналоги принимают ровно те же аргументы, что и скалярные: ufunc numpy
+# восприняли бы лишний позиционный аргумент как out= и записали бы результат в него.
+def vector_abs(value):
+    return np.abs(value)
+
+
+def vector_round(value, digits=0):
+    return np.round(value, digits)
+
+
+def vector_min(first, second, *rest):
+    return reduce(np.minimum, rest, np.minimum(first, second))
+
+
+def vector_max(first, second, *rest):
+    return reduce(np.maximum, rest, np.maximum(first, second))
+
+
+def vector_sqrt(value):
+    return np.sqrt(value)
+
+
+def vector_log(value, base=None):
+    return np.log(value) if base is None else np.log(value) / np.log(base)
+
+
+def vector_exp(value):
+    return np.exp(value)
+
+
+VECTOR_FUNCTIONS = {
+    'abs': vector_abs, 'round': vector_round, 'min': vector_min, 'max': vector_max,
+    'sqrt': vector_sqrt, 'log': vector_log, 'exp': vector_exp,
+} if np is not None else {}
+CALC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Call, ast.Name, ast.Load, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Mod, ast.Pow, ast.UAdd, ast.USub,
+)
+ASSIGNMENT_RE = re.compile(r'^\s*([A-Za-z]\w*)\s*=(?!=)(.*)$')
+
+
+def power(base, exponent):
+    # защита от выражений вида 9**9**9, которые вычислялись бы часами
+    if isinstance(base, int) and isinstance(exponent, int) and abs(base) > 1 and \
+            math.log2(abs(base)) * abs(exponent) > MAX_POWER_BITS:
+        raise ValueError("Слишком большая степень")
+    return base ** exponent
+
+
+class PowerToCall(ast.NodeTransformer):
+    def visit_BinOp(self, node):
+        self.generic_visit(node)
+        if isinstance(node.op, ast.Pow):
+            return ast.Call(func=ast.Name(id='_power', ctx=ast.Load()), args=[node.left, node.right], keywords=[])
+        return node
+
+
+@lru_cache(maxsize=256)
+def compile_expression(expression):
+    # Выражение разбирается и проверяется по белому списку узлов AST один раз,
+    # в кэше лежит готовый code object и набор используемых имён.
+    try:
+        tree = ast.parse(expression.strip(), mode='eval')
+    except SyntaxError as error:
+        raise ValueError(f"Синтаксическая ошибка: {error.msg}")
+    for node in ast.walk(tree):
+        if not isinstance(node, CALC_NODES):
+            raise ValueError(f"Недопустимая конструкция: {type(node).__name__}")
+        if isinstance(node, ast.Constant) and (isinstance(node.value, bool) or not isinstance(node.value, (int, float))):
+            raise ValueError(f"Недопустимое значение: {node.value!r}")
+        if isinstance(node, ast.Call) and (not isinstance(node.func, ast.Name) or node.func.id not in CALC_FUNCTIONS
+                                           or node.keywords):
+            raise ValueError("Допустимы только функции: " + ', '.join(CALC_FUNCTIONS))
+        if isinstance(node, ast.Name) and node.id.startswith('_'):
+            raise ValueError(f"Недопустимое имя: {node.id}")
+    names = {node.id for node in ast.walk(tree) if isinstance(node, ast.Name)} - CALC_FUNCTIONS.keys()
+    tree = ast.fix_missing_locations(PowerToCall().visit(tree))
+    return compile(tree, '<calculator>', 'eval'), frozenset(names)
+
+
+def evaluate_expression(expression, variables, functions=CALC_FUNCTIONS):
+    code, names = compile_expression(expression)
+    missing = names - variables.keys()
+    if missing:
+        raise ValueError("Неизвестные переменные: " + ', '.join(sorted(missing)))
+    return eval(code, {'__builtins__': {}, '_power': power, **functions}, variables)
+
+
 class Calculator:
+    # переменные живут до конца сеанса; ans — результат последнего вычисления
+    variables = {}
+
     @staticmethod
     def calculate():
-        expression = input("Введите выражение:  ")
+        expression = input("Введите выражение (можно x = выражение, ans — прошлый результат):  ")
         try:
-            result = eval(expression)
+            result = Calculator.evaluate(expression)
             print(f"Результат: {result}")
         except Exception as e:
             print(f"Ошибка вычисления: {e}")
 
+    @staticmethod
+    def evaluate(expression):
+        name = None
+        match = ASSIGNMENT_RE.match(expression)
+        if match:
+            name, expression = match.groups()
+        result = evaluate_expression(expression, Calculator.variables)
+        Calculator.variables['ans'] = result
+        if name:
+            Calculator.variables[name] = result
+        return result
 
-
-def main_menu():
+    @staticmethod
+    def apply(expression, columns):
+        # векторный режим: выражение считается один раз над целыми столбцами numpy,
+        # без numpy — построчно по спискам тем же скомпилированным кодом
+        if np is not None:
+            variables = {**Calculator.variables, **{name: np.asarray(column) for name, column in columns.items()}}
+            return evaluate_expression(expression, variables, VECTOR_FUNCTIONS)
+        variables = dict(Calculator.variables)
+        results = []
+        for row in zip(*columns.values()):
+            variables.update(zip(columns, row))
+            results.append(evaluate_expression(expression, variables))
+        return results
+
+
+
+def main_menu(remind=False):
+    # напоминания в меню включаются флагом --remind, иначе их вывод перемешивается с вводом
+    if remind:
+        TaskReminder(limit=REMINDER_MENU_LIMIT).start()
     while True:
         print('''
 Добро пожаловать в Персональный помощник!
@@ -428,7 +2553,8 @@ def notes_menu():
 3. Удалить заметку
 4. Экспорт заметок в CSV
 5. Импорт заметок из CSV
-6. Назад''')
+6. Поиск заметок
+7. Назад''')
         choice = input("Выберите действие: ")
         if choice == "1":
             NotesManager.create_note()
@@ -441,6 +2567,8 @@ def notes_menu():
         elif choice == "5":
             NotesManager.import_from_csv_notes()
         elif choice == "6":
+            NotesManager.search_notes()
+        elif choice == "7":
             break
         else:
             print("Некорректный выбор. Попробуйте снова")
@@ -456,7 +2584,8 @@ def tasks_menu():
 4. Удалить задачу
 5. Создание CSV-файла
 6. Импорт из CSV-файла
-7. Назад
+7. Ближайшие и просроченные задачи
+8. Назад
 ''')
         choice = input("Выберите действие: ")
         if choice == "1":
@@ -472,6 +2601,8 @@ def tasks_menu():
         elif choice == "6":
             TasksManager.import_from_csv_tasks()
         elif choice == "7":
+            TasksManager.view_deadlines()
+        elif choice == "8":
             break
         else:
             print("Некорректный выбор. Попробуйте снова")
@@ -481,7 +2612,7 @@ def contacts_menu():
         print('''
 Управление контактами:
 1. Добавить контакт
-2. Поиск контакта по имени ИЛИ номеру телефона
+2. Поиск контакта по имени, телефону или email
 3. Удалить контакт
 4. Создание CSV-файла
 5. Импорт из CSV-файла
@@ -505,14 +2636,15 @@ def contacts_menu():
 
 def finance_menu():
     while True:
-        print('''
-Управление финансами:
+        print(f'''
+Управление финансами (баланс: {FinanceManager.balance()['balance']:.2f} руб.):
 1. Добавить транзакцию
 2. Посмотреть транзакции
 3. Создание CSV-файла 
 4. Импорт CSV-файла
 5. Генерация финансового отчета
-6. Назад''')
+6. Прогноз «что если» по формуле
+7. Назад''')
         choice = input("Выберите действие: ")
         if choice == "1":
             FinanceManager.add_transaction()
@@ -525,12 +2657,340 @@ def finance_menu():
         elif choice == "5":
             FinanceManager.generate_report()
         elif choice == "6":
+            FinanceManager.what_if_report()
+        elif choice == "7":
             break
         else:
             print("Некорректный выбор. Попробуйте снова")
 
+
+OPERATIONS = {
+    # операция: (класс записи, если операция добавляет запись, и функция)
+    'note-add': (Note, NotesManager.build),
+    'note-list': (None, NotesManager.select),
+    'note-delete': (None, NotesManager.delete),
+    'note-search': (None, NotesManager.search),
+    'task-add': (Task, TasksManager.build),
+    'task-list': (None, TasksManager.select),
+    'task-done': (None, TasksManager.complete),
+    'task-delete': (None, TasksManager.delete),
+    'task-upcoming': (None, TasksManager.upcoming),
+    'task-overdue': (None, TasksManager.overdue),
+    'task-due-soon': (None, TasksManager.due_within),
+    'contact-add': (Contact, ContactsManager.build),
+    'contact-list': (None, ContactsManager.select),
+    'contact-delete': (None, ContactsManager.delete),
+    'contact-search': (None, ContactsManager.search),
+    'finance-add': (Finance, FinanceManager.build),
+    'finance-list': (None, FinanceManager.select),
+    'finance-report': (None, FinanceManager.report),
+    'finance-balance': (None, FinanceManager.balance),
+    'finance-whatif': (None, FinanceManager.what_if),
+    'calc': (None, Calculator.evaluate),
+}
+# хранилище, с которым работает операция, — по префиксу её имени
+OPERATION_STORES = {'note': Note, 'task': Task, 'contact': Contact, 'finance': Finance}
+
+
+def run_operations(operations):
+    # Хранилище входит в общую транзакцию при первой операции, которая к нему обращается:
+    # один цикл загрузки и фиксации на весь пакет, а нетронутые хранилища не загружаются.
+    # Добавления копятся по хранилищам и пишутся одним add() перед любой другой операцией и в конце,
+    # ID для них берутся одной пачкой. Ошибка в операции попадает в её результат, остальные выполняются.
+    reserve_ids(sum(1 for operation in operations
+                    if isinstance(operation, dict) and OPERATIONS.get(operation.get('op'), (None,))[0] is not None))
+    results = []
+    pending = {}
+
+    def flush():
+        for record_class, records in pending.items():
+            get_repository(record_class).add(records)
+        pending.clear()
+
+    with ExitStack() as stack:
+        opened = set()
+        for operation in operations:
+            try:
+                if not isinstance(operation, dict) or operation.get('op') not in OPERATIONS:
+                    raise ValueError(f"Неизвестная операция: {operation}")
+                record_class, function = OPERATIONS[operation['op']]
+                store = OPERATION_STORES.get(operation['op'].split('-')[0])
+                if store is not None and store not in opened:
+                    stack.enter_context(get_repository(store).transaction())
+                    opened.add(store)
+                arguments = {name: value for name, value in operation.items() if name != 'op'}
+                if record_class is not None:
+                    record = function(**arguments)
+                    pending.setdefault(record_class, []).append(record)
+                    results.append({'result': {'id': record['id']}})
+                    continue
+                flush()
+                result = function(**arguments)
+                if hasattr(result, '__next__'):
+                    result = list(result)
+                results.append({'result': result})
+            except (ArithmeticError, KeyError, TypeError, ValueError) as error:
+                results.append({'error': str(error)})
+        flush()
+    reserve_ids(0)
+    return results
+
+
+def run_batch(stream):
+    # Пакетный режим: по одной JSON-операции в строке, например {"op": "note-add", "title": "...", "content": "..."}.
+    # На каждую строку в stdout выводится строка с результатом или ошибкой.
+    started = time.perf_counter()
+    operations = []
+    for line in stream:
+        if not line.strip():
+            continue
+        try:
+            operations.append(json.loads(line))
+        except ValueError:
+            operations.append(line.strip())
+    results = run_operations(operations)
+    lines = []
+    errors = 0
+    for result in results:
+        try:
+            line = json.dumps(result, ensure_ascii=False, default=record_default)
+        except (TypeError, ValueError) as error:
+            # результат не выводится (например, слишком длинное целое) — это ошибка только этой операции
+            result = {'error': f"Не удалось вывести результат: {error}"}
+            line = json.dumps(result, ensure_ascii=False)
+        errors += 'error' in result
+        lines.append(line + '\n')
+    sys.stdout.write(''.join(lines))
+    elapsed = time.perf_counter() - started
+    print(f"Операций: {len(results)}, ошибок: {errors}, {elapsed:.2f} с ({len(results) / max(elapsed, 1e-9):.0f} оп/с)",
+          file=sys.stderr)
+    return errors
+
+
+def add_operation_parser(commands, name, function):
+    # аргументы подкоманды берутся из сигнатуры функции: обязательные — позиционные, прочие — --опции
+    parser = commands.add_parser(name)
+    for parameter in inspect.signature(function).parameters.values():
+        if parameter.default is inspect.Parameter.empty:
+            parser.add_argument(parameter.name)
+        elif isinstance(parameter.default, bool):
+            parser.add_argument(f'--{parameter.name}', action='store_true')
+        else:
+            parser.add_argument(f'--{parameter.name}', default=parameter.default,
+                                type=type(parameter.default) if parameter.default is not None else str)
+
+
+class Stats:
+    # Инструментирование: время вызовов (гистограмма по степеням двойки в микросекундах),
+    # байты и число записей. Обёртки ставятся только при включении, поэтому выключенное
+    # инструментирование ничего не стоит.
+    operations = {}
+    target = None
+    profile = None
+    profiler = None
+    enabled = False
+
+    @staticmethod
+    def record(name, elapsed, counters):
+        entry = Stats.operations.get(name)
+        if entry is None:
+            entry = Stats.operations[name] = {'calls': 0, 'total': 0.0, 'max': 0.0, 'histogram': {}}
+        entry['calls'] += 1
+        entry['total'] += elapsed
+        if elapsed > entry['max']:
+            entry['max'] = elapsed
+        bucket = int(elapsed * 1e6).bit_length()
+        entry['histogram'][bucket] = entry['histogram'].get(bucket, 0) + 1
+        for key, value in counters.items():
+            entry[key] = entry.get(key, 0) + value
+
+    @staticmethod
+    def percentile(histogram, calls, share):
+        # верхняя граница корзины, в которую попадает нужная доля вызовов
+        seen = 0
+        for bucket in sorted(histogram):
+            seen += histogram[bucket]
+            if seen >= share * calls:
+                return 2 ** bucket / 1000
+        return None
+
+    @staticmethod
+    def report():
+        operations = {}
+        for name, entry in sorted(Stats.operations.items(), key=lambda item: -item[1]['total']):
+            calls, histogram = entry['calls'], entry['histogram']
+            operations[name] = {
+                'calls': calls,
+                'total_ms': round(entry['total'] * 1000, 3),
+                'mean_ms': round(entry['total'] * 1000 / calls, 3),
+                'max_ms': round(entry['max'] * 1000, 3),
+                'p50_ms': Stats.percentile(histogram, calls, 0.5),
+                'p90_ms': Stats.percentile(histogram, calls, 0.9),
+                'p99_ms': Stats.percentile(histogram, calls, 0.99),
+                'histogram_us': {f"<{2 ** bucket}": histogram[bucket] for bucket in sorted(histogram)},
+                **{key: value for key, value in entry.items() if key not in ('calls', 'total', 'max', 'histogram')},
+            }
+        return {'operations': operations}
+
+
+STATS_COUNTERS = {
+    'read_file': lambda args, result: {'bytes_read': len(result)},
+    'write_file_atomic': lambda args, result: {'bytes_written': len(args[1])},
+    'decode_data': lambda args, result: {'bytes': len(args[0]), 'records': len(result)},
+    'encode_data': lambda args, result: {'bytes': len(result), 'records': len(args[0])},
+    'dumps_line': lambda args, result: {'bytes_written': len(result.encode('utf-8'))},
+    'load_data': lambda args, result: {'records': len(result)},
+    'save_data': lambda args, result: {'records': len(args[1])},
+    'import_csv': lambda args, result: {'records': result[0]},
+    'export_csv': lambda args, result: {'records': result},
+    'Journal.load': lambda args, result: {'records': len(result)},
+    'Repository.rebuild': lambda args, result: {'records': len(args[1])},
+    'Repository.add': lambda args, result: {'records': len(args[1])},
+    'SQLiteRepository.add': lambda args, result: {'records': len(args[1])},
+}
+STATS_FUNCTIONS = ['read_file', 'write_file_atomic', 'decode_data', 'encode_data', 'dumps_line', 'load_data',
+                   'save_data', 'import_csv', 'export_csv', 'migrate_to_sqlite', 'run_operations']
+STATS_CLASSES = {
+    'Journal': ['load', 'write', 'compact'],
+    'Repository': ['refresh', 'rebuild', 'add', 'delete', 'update'],
+    'SQLiteRepository': ['refresh', 'add', 'delete', 'update'],
+    'NotesIndex': ['open', 'search'],
+    'ContactsIndex': ['search'],
+    'FinanceAggregates': ['rebuild', 'load', 'save', 'report'],
+    'AggregateColumns': ['report'],
+}
+STATS_MANAGERS = ['NotesManager', 'TasksManager', 'ContactsManager', 'FinanceManager', 'Calculator']
+
+
+def timed(name, function):
+    counters = STATS_COUNTERS.get(name)
+
+    @wraps(function)
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        result = function(*args, **kwargs)
+        Stats.record(name, time.perf_counter() - started, counters(args, result) if counters else {})
+        return result
+    return wrapper
+
+
+def enable_instrumentation(target='stderr', profile=''):
+    # Функции модуля, методы хранилищ и все методы менеджеров подменяются обёртками,
+    # при выходе статистика выводится в stderr или пишется JSON-файлом (target).
+    # profile: cprofile — профиль в assistant.prof и топ-25 в stderr, tracemalloc — пики памяти.
+    Stats.target, Stats.profile = target, profile
+    if Stats.enabled:
+        return
+    Stats.enabled = True
+    module = globals()
+    wrapped = {}
+    for name in STATS_FUNCTIONS:
+        wrapped[module[name]] = module[name] = timed(name, module[name])
+    for class_name, methods in STATS_CLASSES.items():
+        for method in methods:
+            setattr(module[class_name], method, timed(f'{class_name}.{method}', getattr(module[class_name], method)))
+    for class_name in STATS_MANAGERS:
+        for method, value in list(vars(module[class_name]).items()):
+            if isinstance(value, staticmethod):
+                function = value.__func__
+                wrapped[function] = timed(f'{class_name}.{method}', function)
+                setattr(module[class_name], method, staticmethod(wrapped[function]))
+    for operation, (record_class, function) in OPERATIONS.items():
+        OPERATIONS[operation] = (record_class, wrapped.get(function, function))
+    if profile == 'cprofile':
+        import cProfile
+        Stats.profiler = cProfile.Profile()
+        Stats.profiler.enable()
+    elif profile == 'tracemalloc':
+        import tracemalloc
+        tracemalloc.start(10)
+    atexit.register(dump_stats)
+
+
+def dump_stats():
+    if Stats.profile == 'cprofile':
+        Stats.profiler.disable()
+    report = Stats.report()
+    if Stats.profile == 'cprofile':
+        import pstats
+        Stats.profiler.dump_stats('assistant.prof')
+        pstats.Stats(Stats.profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(25)
+    elif Stats.profile == 'tracemalloc':
+        import tracemalloc
+        current, peak = tracemalloc.get_traced_memory()
+        top = tracemalloc.take_snapshot().statistics('lineno')[:15]
+        report['tracemalloc'] = {'current_bytes': current, 'peak_bytes': peak, 'top': [str(line) for line in top]}
+    output = json.dumps(report, ensure_ascii=False, indent=4)
+    if Stats.target in (None, '1', 'stderr'):
+        print(output, file=sys.stderr)
+    else:
+        with open(Stats.target, 'w', encoding='utf-8') as stats_file:
+            stats_file.write(output + '\n')
+
+
+if STATS_TARGET != '0' or PROFILE_MODE:
+    enable_instrumentation(STATS_TARGET if STATS_TARGET != '0' else 'stderr', PROFILE_MODE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Персональный помощник")
+    parser.add_argument('--stats', action='store_true', help="собрать статистику операций и вывести её в stderr при выходе")
+    parser.add_argument('--stats-file', metavar='ФАЙЛ', help="то же, но записать статистику JSON-файлом")
+    parser.add_argument('--profile', choices=['cprofile', 'tracemalloc'], help="дополнительно снять профиль")
+    parser.add_argument('--remind', action='store_true', help="напоминать о дедлайнах в интерактивном меню")
+    commands = parser.add_subparsers(dest='command')
+    for name, (_, function) in OPERATIONS.items():
+        add_operation_parser(commands, name, function)
+    batch = commands.add_parser('batch', help="выполнить JSONL-операции из файла или stdin")
+    batch.add_argument('file', nargs='?', default='-')
+    commands.add_parser('remind', help="напоминать о дедлайнах задач, пока процесс не остановят")
+    migrate = commands.add_parser('migrate-sqlite', help="перенести JSON-хранилища и CSV-выгрузки в SQLite")
+    migrate.add_argument('--db', default=SQLITE_PATH)
+    migrate.add_argument('--csv', action='append', default=[], metavar='ХРАНИЛИЩЕ=ФАЙЛ',
+                         help="CSV-выгрузка для переноса, например notes=notes_export.csv")
+    args = parser.parse_args()
+    if args.stats or args.stats_file or args.profile:
+        enable_instrumentation(args.stats_file or 'stderr', args.profile or '')
+    if args.command == 'migrate-sqlite':
+        stores = {'notes': Note, 'tasks': Task, 'contacts': Contact, 'finance': Finance}
+        csv_files = []
+        for item in args.csv:
+            store, _, file_name = item.partition('=')
+            if store not in stores or not file_name:
+                parser.error(f"Некорректный параметр --csv: {item}")
+            csv_files.append((stores[store], file_name))
+        migrate_to_sqlite(args.db, csv_files)
+    elif args.command == 'remind':
+        try:
+            TaskReminder(lambda message: print(message, flush=True)).start(background=False)
+        except KeyboardInterrupt:
+            pass
+    elif args.command == 'batch':
+        if args.file == '-':
+            errors = run_batch(sys.stdin)
+        else:
+            with open(args.file, 'r', encoding='utf-8') as batch_file:
+                errors = run_batch(batch_file)
+        sys.exit(1 if errors else 0)
+    elif args.command in OPERATIONS:
+        operation = {name: value for name, value in vars(args).items() if name not in ('command', 'stats', 'stats_file', 'profile', 'remind')}
+        operation['op'] = args.command
+        result, = run_operations([operation])
+        if 'error' in result:
+            print(result['error'], file=sys.stderr)
+            sys.exit(1)
+        try:
+            output = json.dumps(result['result'], ensure_ascii=False, indent=4, default=record_default)
+        except (TypeError, ValueError) as error:
+            print(f"Не удалось вывести результат: {error}", file=sys.stderr)
+            sys.exit(1)
+        print(output)
+    else:
+        main_menu(args.remind)
+
+
 if __name__ == "__main__":
-    main_menu()    
+    main()    
 
 
 
@@ -0,0 +1,27 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import personal_assisnant as pa
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    # каждое хранилище создаётся заново во временном каталоге
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(pa, 'STORAGE_BACKEND', 'json')
+    monkeypatch.setattr(pa, 'FSYNC', False)
+    monkeypatch.setattr(pa, 'repositories', {})
+    monkeypatch.setattr(pa, 'sqlite_connections', {})
+    return tmp_path
+
+
+@pytest.fixture
+def reopen(monkeypatch):
+    # имитация нового процесса: хранилища и слушатели читаются с диска
+    def reopen():
+        monkeypatch.setattr(pa, 'repositories', {})
+    return reopen
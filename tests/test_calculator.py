@@ -0,0 +1,50 @@
+import io
+import json
+
+import pytest
+
+import personal_assisnant as pa
+
+
+def test_power_results_stay_printable():
+    assert len(str(pa.Calculator.evaluate('10**4000'))) == 4001
+    with pytest.raises(ValueError):
+        pa.Calculator.evaluate('2**20000')
+
+
+def test_unsafe_expressions_are_rejected():
+    for expression in ('__import__("os")', '(1).__class__', '"a" * 3', 'open("x")'):
+        with pytest.raises(ValueError):
+            pa.Calculator.evaluate(expression)
+
+
+def test_batch_reports_unprintable_result_per_operation(workdir, capsys):
+    stream = io.StringIO('\n'.join(json.dumps(operation) for operation in (
+        {'op': 'note-add', 'title': 'a', 'content': 'b'},
+        {'op': 'calc', 'expression': '2**7000 * 2**7000 * 2**7000'},
+        {'op': 'calc', 'expression': '1 + 1'},
+    )))
+    assert pa.run_batch(stream) == 1
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert 'id' in results[0]['result']
+    assert 'error' in results[1]
+    assert results[2] == {'result': 2}
+
+
+def test_what_if_does_not_modify_cached_columns(workdir):
+    finance = pa.get_repository(pa.Finance)
+    finance.add([pa.FinanceManager.build('a', 100, '01-01-2024', 'x'), pa.FinanceManager.build('b', -150, '02-01-2024', 'y')])
+    before = pa.FinanceManager.what_if('amount')
+    projected = pa.FinanceManager.what_if('max(amount, 0, amount)')
+    assert projected['after'] == {'income': 100.0, 'expenses': 0.0, 'balance': 100.0}
+    assert pa.FinanceManager.what_if('amount') == before
+    assert before['before']['expenses'] == 150.0
+
+
+def test_vector_functions_match_scalar_mode():
+    for expression in ('max(amount, 1, 3)', 'min(amount, 2)', 'round(amount / 3, 2)', 'log(amount, 2)', 'abs(-amount)'):
+        vector = pa.Calculator.apply(expression, {'amount': [4.0, 8.0]})
+        scalar = [pa.evaluate_expression(expression, {'amount': amount}) for amount in (4.0, 8.0)]
+        assert [float(value) for value in vector] == pytest.approx(scalar)
+    with pytest.raises(TypeError):
+        pa.Calculator.apply('abs(amount, amount)', {'amount': [1.0]})
@@ -0,0 +1,39 @@
+import csv
+
+import personal_assisnant as pa
+
+
+def add(*transactions):
+    pa.get_repository(pa.Finance).add([pa.FinanceManager.build(*transaction) for transaction in transactions])
+
+
+def test_report_spans_year_boundary(workdir):
+    add(('до', 500, '10-12-2023', 'Зарплата'), ('ёлка', -100, '30-12-2023', 'Дом'),
+        ('такси', -40, '01-01-2024', 'Транспорт'), ('премия', 200, '15-01-2024', 'Зарплата'),
+        ('после', 999, '01-02-2024', 'Зарплата'))
+    report = pa.FinanceManager.report('20-12-2023', '31-01-2024', 'month')
+    assert (report['income'], report['expenses'], report['balance']) == (200.0, 140.0, 60.0)
+    assert report['categories'] == {'Дом': -100.0, 'Транспорт': -40.0, 'Зарплата': 200.0}
+    assert report['periods'] == [('12-2023', 0.0, 100.0), ('01-2024', 200.0, 40.0)]
+    # недели начинаются с понедельника: 01-01-2024 открывает новую, 30-12-2024 — неделю через Новый год
+    weeks = pa.FinanceManager.report('20-12-2023', '31-01-2024', 'week')['periods']
+    assert weeks == [('25-12-2023', 0.0, 100.0), ('01-01-2024', 0.0, 40.0), ('15-01-2024', 200.0, 0.0)]
+    add(('подарки', -70, '31-12-2024', 'Дом'), ('каток', -30, '02-01-2025', 'Отдых'))
+    assert pa.FinanceManager.report('01-12-2024', '31-01-2025', 'week')['periods'] == [('30-12-2024', 0.0, 100.0)]
+
+
+def test_report_csv_contains_only_range_in_date_order(workdir, monkeypatch):
+    add(('после', 999, '01-02-2024', 'Зарплата'), ('такси', -40, '01-01-2024', 'Транспорт'),
+        ('ёлка', -100, '30-12-2023', 'Дом'), ('до', 500, '10-12-2023', 'Зарплата'))
+    answers = iter(['20-12-2023', '31-01-2024', ''])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    pa.FinanceManager.generate_report()
+    with open('report_20-12-2023_31-01-2024.csv', newline='', encoding='utf-8') as f:
+        rows = list(csv.DictReader(f))
+    assert [row['description'] for row in rows] == ['ёлка', 'такси']
+
+
+def test_select_filters_category_and_sorts_by_amount(workdir):
+    add(('a', -5, '01-01-2024', 'Еда'), ('b', -50, '02-01-2024', 'Еда'), ('c', 10, '03-01-2024', 'Зарплата'))
+    assert [record['description'] for record in pa.FinanceManager.select('amount', category='Еда')] == ['b', 'a']
+    assert [record['description'] for record in pa.FinanceManager.select('date', reverse=True)] == ['c', 'b', 'a']
@@ -0,0 +1,32 @@
+import json
+
+import personal_assisnant as pa
+
+
+def test_ids_are_unique_and_increasing(workdir):
+    ids = list(pa.allocate_ids(500))
+    pa.reserve_ids(3)
+    ids += [pa.next_id() for _ in range(5)]
+    ids += list(pa.allocate_ids(10))
+    assert ids == sorted(set(ids))
+
+
+def test_reimported_export_gets_fresh_ids(workdir):
+    notes = pa.get_repository(pa.Note)
+    notes.add([pa.NotesManager.build('a', ''), pa.NotesManager.build('b', '')])
+    pa.export_csv('notes.csv', pa.Note.FIELDS, list(notes))
+    assert pa.import_csv(pa.Note, 'notes.csv') == (2, 0)
+    ids = [record['id'] for record in notes]
+    assert len(set(ids)) == 4
+    assert notes.delete([ids[0]]) == 1
+
+
+def test_legacy_records_get_ids_once(workdir, reopen):
+    with open(pa.Finance.FILE_PATH, 'w', encoding='utf-8') as f:
+        json.dump([{'description': 'x', 'amount': 5, 'date': '01-02-2024', 'category': 'e'},
+                   {'description': 'y', 'amount': -2, 'date': '02-02-2024', 'category': 'e'}], f)
+    ids = [record['id'] for record in pa.get_repository(pa.Finance)]
+    assert None not in ids and len(set(ids)) == 2
+    reopen()
+    assert [record['id'] for record in pa.get_repository(pa.Finance)] == ids
+    assert [record['id'] for record in pa.read_snapshot(pa.Finance.FILE_PATH)] == ids
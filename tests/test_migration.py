@@ -0,0 +1,24 @@
+import csv
+import json
+
+import personal_assisnant as pa
+
+
+def test_csv_rows_without_id_are_not_migrated_twice(workdir):
+    ledger = [
+        {'id': 1, 'description': 'кофе', 'amount': -150, 'date': '05-03-2024', 'category': 'Еда'},
+        {'id': 2, 'description': 'кофе', 'amount': -150, 'date': '05-03-2024', 'category': 'Еда'},
+    ]
+    with open(pa.Finance.FILE_PATH, 'w', encoding='utf-8') as f:
+        json.dump(ledger, f)
+    with open('finance_export.csv', 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['description', 'amount', 'date', 'category'])
+        writer.writerow(['кофе', '-150.0', '05-03-2024', 'Еда'])
+        writer.writerow(['кофе', '-150.0', '05-03-2024', 'Еда'])
+        writer.writerow(['кофе', '-150.0', '05-03-2024', 'Еда'])
+        writer.writerow(['пенсия', '12000.0', '12-12-2024', 'Пенсия'])
+    pa.migrate_to_sqlite('assistant.db', [(pa.Finance, 'finance_export.csv')])
+    migrated = pa.SQLiteRepository(pa.Finance, 'assistant.db')
+    assert sorted(record['description'] for record in migrated) == ['кофе', 'кофе', 'кофе', 'пенсия']
+    assert len({record['id'] for record in migrated}) == 4
@@ -0,0 +1,19 @@
+import personal_assisnant as pa
+
+
+def test_only_touched_stores_are_opened(workdir):
+    assert pa.run_operations([{'op': 'calc', 'expression': '1 + 1'}]) == [{'result': 2}]
+    assert pa.repositories == {}
+    results = pa.run_operations([{'op': 'note-add', 'title': 'a', 'content': 'b'}, {'op': 'note-list'}])
+    assert [note['id'] for note in results[1]['result']] == [results[0]['result']['id']]
+    assert list(pa.repositories) == [pa.Note.FILE_PATH]
+
+
+def test_failed_operation_does_not_abort_batch(workdir):
+    results = pa.run_operations([
+        {'op': 'finance-add', 'description': 'x', 'amount': 5, 'date': '31-02-2024', 'category': 'e'},
+        {'op': 'unknown'},
+        {'op': 'finance-add', 'description': 'y', 'amount': 5, 'date': '01-02-2024', 'category': 'e'},
+    ])
+    assert ['error' in result for result in results] == [True, True, False]
+    assert pa.FinanceManager.balance()['transactions'] == 1
@@ -0,0 +1,64 @@
+import personal_assisnant as pa
+
+
+def note(title, content):
+    return pa.NotesManager.build(title, content)
+
+
+def test_terms_stay_sorted_after_bulk_and_single_changes(workdir, reopen):
+    notes = pa.get_repository(pa.Note)
+    notes.add([note(f'заметка {i}', f'слово{i} общее') for i in range(50)])
+    notes.add([note('ещё одна', 'уникальный текст')])
+    notes.delete([next(iter(notes))['id']])
+    index = pa.get_listener(pa.Note, pa.NotesIndex)
+    assert index.terms == sorted(index.postings)
+    reopen()
+    assert [found['title'] for _, found in pa.NotesManager.search('уник*')] == ['ещё одна']
+    index = pa.get_listener(pa.Note, pa.NotesIndex)
+    assert index.terms == sorted(index.postings)
+
+
+def test_ranking_prefers_more_frequent_term(workdir):
+    pa.get_repository(pa.Note).add([note('молоко', 'купить молоко, молоко и хлеб'), note('хлеб', 'купить хлеб и молоко')])
+    titles = [found['title'] for _, found in pa.NotesManager.search('молоко')]
+    assert titles == ['молоко', 'хлеб']
+    assert pa.NotesManager.search('сыр') == []
+
+
+def contacts():
+    pa.get_repository(pa.Contact).add([
+        pa.ContactsManager.build('Петров Пётр', '+7 (999) 123-45-67', 'petrov@mail.ru'),
+        pa.ContactsManager.build('Сидоров Иван', '8 912 000-11-22', 'sid@mail.ru'),
+        pa.ContactsManager.build('Иванова Анна', '+7 903 555-00-00', 'anna@mail.ru'),
+        pa.ContactsManager.build('Смирнов Олег', '+7 916 777-88-99', 'oleg@mail.ru'),
+    ])
+
+
+def found(query):
+    return [contact['name'] for contact in pa.ContactsManager.search(query)]
+
+
+def test_one_letter_typos_in_names_are_forgiven(workdir):
+    contacts()
+    assert found('Петрв') == ['Петров Пётр']
+    assert found('Сидорв') == ['Сидоров Иван']
+    assert found('Ивонова') == ['Иванова Анна']
+    assert 'Иванова Анна' in found('Иванва')
+    assert found('Сидорв Иван') == ['Сидоров Иван']
+    assert found('Петренко') == []
+
+
+def test_phone_prefix_without_country_code(workdir):
+    contacts()
+    assert found('999') == ['Петров Пётр']
+    assert found('912 000') == ['Сидоров Иван']
+    assert found('8903') == ['Иванова Анна']
+    assert found('+7 916') == ['Смирнов Олег']
+
+
+def test_fuzzy_index_follows_deletions(workdir):
+    contacts()
+    assert found('Смирнв') == ['Смирнов Олег']
+    repository = pa.get_repository(pa.Contact)
+    repository.delete([contact['id'] for contact in repository if contact['name'].startswith('Смирнов')])
+    assert found('Смирнв') == []
@@ -0,0 +1,71 @@
+import pytest
+
+import personal_assisnant as pa
+
+
+@pytest.fixture
+def sqlite_store(workdir, monkeypatch):
+    monkeypatch.setattr(pa, 'STORAGE_BACKEND', 'sqlite')
+    monkeypatch.setattr(pa, 'SQLITE_PATH', str(workdir / 'assistant.db'))
+    return workdir
+
+
+def task(title, due_date='01-01-2024'):
+    return pa.TasksManager.build(title, '', 'Высокий', due_date)
+
+
+def test_reminder_does_not_see_uncommitted_tasks(sqlite_store):
+    tasks = pa.get_repository(pa.Task)
+    tasks.add([task('готово')])
+    reminded = []
+    reminder = pa.TaskReminder(reminded.append)
+    assert reminder.tasks.connection is not tasks.connection
+    with pytest.raises(RuntimeError):
+        with tasks.transaction():
+            tasks.add([task('откатится')])
+            reminder.check()
+            raise RuntimeError
+    assert len(reminded) == 1 and 'готово' in reminded[0]
+    assert [record['title'] for record in tasks] == ['готово']
+
+
+def test_update_and_delete_round_trip(sqlite_store):
+    tasks = pa.get_repository(pa.Task)
+    tasks.add([task('a'), task('b', '02-01-2024')])
+    first = tasks.find('done', 'not done')[0]
+    assert pa.TasksManager.complete(first['id'])
+    assert [record['title'] for record in tasks.find('done', 'done')] == ['a']
+    assert tasks.delete([first['id']]) == 1
+    assert [record['title'] for _, record in tasks.ordered('due_date')] == ['b']
+
+
+def test_update_of_missing_task_is_a_no_op(sqlite_store):
+    tasks = pa.get_repository(pa.Task)
+    tasks.add([task('a')])
+    missing = {'id': 12345}
+    tasks.update(missing, {'done': 'done'})
+    assert missing == {'id': 12345}
+    assert [record['done'] for record in tasks] == ['not done']
+
+
+class Reloads:
+    def __init__(self):
+        self.count = 0
+
+    def reloaded(self, repository):
+        self.count += 1
+
+
+def test_reload_only_for_changed_table(sqlite_store):
+    tasks, notes = pa.get_repository(pa.Task), pa.get_repository(pa.Note)
+    task_reloads, note_reloads = Reloads(), Reloads()
+    tasks.listeners.append(task_reloads)
+    notes.listeners.append(note_reloads)
+    len(tasks), len(notes)
+    tasks.add([task('свой')])
+    len(tasks), len(notes)
+    assert (task_reloads.count, note_reloads.count) == (1, 1)
+    # запись в заметки через другое соединение, как из другого процесса
+    pa.open_repository(pa.Note, own_connection=True).add([pa.NotesManager.build('чужая', '')])
+    len(tasks), len(notes)
+    assert (task_reloads.count, note_reloads.count) == (1, 2)
@@ -0,0 +1,177 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import personal_assisnant as pa
+
+
+def transaction(amount, day='01-01-2024', category='Еда'):
+    return pa.FinanceManager.build('t', amount, day, category)
+
+
+def test_compaction_does_not_count_added_transactions_twice(workdir, reopen, monkeypatch):
+    monkeypatch.setattr(pa, 'COMPACT_THRESHOLD', 5)
+    finance = pa.get_repository(pa.Finance)
+    for _ in range(12):
+        finance.add([transaction(1) for _ in range(100)])
+    assert pa.FinanceManager.balance() == {'income': 1200.0, 'expenses': 0.0, 'balance': 1200.0, 'transactions': 1200}
+    reopen()
+    assert pa.FinanceManager.balance()['transactions'] == 1200
+    assert len(pa.get_repository(pa.Finance)) == 1200
+
+
+def test_aggregates_are_journaled_between_compactions(workdir, reopen):
+    finance = pa.get_repository(pa.Finance)
+    finance.add([transaction(100), transaction(-30, '02-01-2024', 'Транспорт')])
+    snapshot = os.stat('finance.json.agg').st_mtime_ns
+    finance.add([transaction(50)])
+    finance.delete([next(iter(finance))['id']])
+    assert os.stat('finance.json.agg').st_mtime_ns == snapshot
+    assert os.path.exists('finance.json.agg.log')
+    reopen()
+    aggregates = pa.get_listener(pa.Finance, pa.FinanceAggregates)
+    assert aggregates.load(aggregates.stamp_of(pa.get_repository(pa.Finance)))
+    assert pa.FinanceManager.balance() == {'income': 50.0, 'expenses': 30.0, 'balance': 20.0, 'transactions': 2}
+    report = pa.FinanceManager.report('01-01-2024', '31-01-2024')
+    assert report['categories'] == {'Еда': 50.0, 'Транспорт': -30.0}
+
+
+def test_aggregates_are_rebuilt_after_unrecorded_change(workdir, reopen):
+    pa.get_repository(pa.Finance).add([transaction(10)])
+    # изменение без слушателей: журнал агрегатов о нём не знает
+    pa.open_repository(pa.Finance).add([transaction(5)])
+    reopen()
+    assert pa.FinanceManager.balance()['income'] == 15.0
+
+
+def notes_store():
+    return pa.open_repository(pa.Note)
+
+
+def note(title):
+    return pa.NotesManager.build(title, '')
+
+
+def test_journal_replays_adds_updates_and_tombstones(workdir):
+    notes = notes_store()
+    notes.add([note('a'), note('b'), note('c')])
+    first, second, _ = list(notes)
+    notes.update(first, {'title': 'a2'})
+    assert notes.delete([second['id']]) == 1
+    assert notes.delete([second['id']]) == 0
+    assert not os.path.exists(pa.Note.FILE_PATH)
+    reopened = notes_store()
+    assert [record['title'] for record in reopened] == ['a2', 'c']
+    assert reopened.get(second['id']) is None
+
+
+def test_compaction_folds_journal_into_snapshot(workdir, monkeypatch):
+    monkeypatch.setattr(pa, 'COMPACT_THRESHOLD', 3)
+    notes = notes_store()
+    for title in 'abcd':
+        notes.add([note(title)])
+    notes.delete([next(iter(notes))['id']])
+    # третья операция переписала снимок, добавление d и удаление a остались в журнале
+    assert [record['title'] for record in pa.read_snapshot(pa.Note.FILE_PATH)] == ['a', 'b', 'c']
+    assert notes.journal.pending == 2
+    assert [record['title'] for record in notes_store()] == ['b', 'c', 'd']
+
+
+def test_stale_journal_is_not_replayed_twice(workdir):
+    notes = notes_store()
+    notes.add([note('a'), note('b')])
+    # сбой между заменой снимка и удалением журнала: журнал относится к старому снимку
+    pa.write_snapshot(pa.Note.FILE_PATH, list(notes))
+    assert [record['title'] for record in notes_store()] == ['a', 'b']
+    reopened = notes_store()
+    reopened.add([note('c')])
+    assert [record['title'] for record in notes_store()] == ['a', 'b', 'c']
+
+
+def test_torn_last_journal_line_is_ignored(workdir):
+    notes = notes_store()
+    notes.add([note('a')])
+    with open(pa.Note.FILE_PATH + pa.JOURNAL_SUFFIX, 'a', encoding='utf-8') as log_file:
+        log_file.write('{"op": "add", "records": [{"id"')
+    assert [record['title'] for record in notes_store()] == ['a']
+
+
+def test_transaction_commits_through_segment(workdir):
+    notes = notes_store()
+    with notes.transaction():
+        notes.add([note('a')])
+        notes.add([note('b')])
+        # до фиксации записи лежат только в сегменте, журнал хранилища их не видит
+        assert not os.path.exists(pa.Note.FILE_PATH + pa.JOURNAL_SUFFIX)
+    assert [record['title'] for record in notes_store()] == ['a', 'b']
+    assert len([name for name in os.listdir('.') if name.endswith('.seg')]) == 1
+
+
+def test_transaction_rollback_discards_segment(workdir):
+    notes = notes_store()
+    notes.add([note('a')])
+    with pytest.raises(RuntimeError):
+        with notes.transaction():
+            notes.add([note('b')])
+            raise RuntimeError
+    assert [record['title'] for record in notes] == ['a']
+    assert [record['title'] for record in notes_store()] == ['a']
+    assert not [name for name in os.listdir('.') if name.endswith('.seg')]
+
+
+def test_unknown_fields_survive_round_trip(workdir):
+    with open(pa.Finance.FILE_PATH, 'w', encoding='utf-8') as f:
+        json.dump([{'id': 1, 'description': 'x', 'amount': 5, 'date': '1-2-2024', 'category': 'e', 'note': 'старое'}], f)
+    finance = pa.open_repository(pa.Finance)
+    finance.add([transaction(1)])
+    finance.journal.compact(list(finance))
+    legacy = pa.read_snapshot(pa.Finance.FILE_PATH)[0]
+    assert legacy == {'id': 1, 'description': 'x', 'amount': 5, 'date': '1-2-2024', 'category': 'e', 'note': 'старое'}
+
+
+def test_concurrent_writers_do_not_lose_records(workdir):
+    script = (
+        "import sys; sys.path.insert(0, %r); import personal_assisnant as pa\n"
+        "pa.FSYNC = False; pa.COMPACT_THRESHOLD = 20\n"
+        "notes = pa.open_repository(pa.Note)\n"
+        "for i in range(60): notes.add([pa.NotesManager.build(sys.argv[1], str(i))])\n"
+    ) % os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    writers = [subprocess.Popen([sys.executable, '-c', script, str(n)]) for n in range(4)]
+    assert all(writer.wait(timeout=120) == 0 for writer in writers)
+    records = list(notes_store())
+    assert len(records) == 240
+    assert len({record['id'] for record in records}) == 240
+
+
+def test_update_of_missing_record_is_a_no_op(workdir):
+    notes = notes_store()
+    notes.add([note('a')])
+    notes.update({'id': 12345}, {'title': 'b'})
+    assert [record['title'] for record in notes_store()] == ['a']
+    assert notes.journal.pending == 1
+
+
+def test_vectorized_report_matches_python_fallback(workdir, monkeypatch):
+    finance = pa.get_repository(pa.Finance)
+    finance.add([transaction(100, '30-12-2023'), transaction(-40, '02-01-2024', 'Транспорт'),
+                 transaction(-10, '15-01-2024'), transaction(25, '03-02-2024', 'Зарплата')])
+    start, end = pa.date_ordinal('01-12-2023'), pa.date_ordinal('31-01-2024')
+    columns = pa.get_listener(pa.Finance, pa.FinanceAggregates).report_columns()
+    vectorized = columns.report(start, end, 'month')
+    monkeypatch.setattr(pa, 'np', None)
+    assert vectorized == columns.report(start, end, 'month')
+    assert vectorized['categories'] == {'Еда': 90.0, 'Транспорт': -40.0}
+    assert [label for label, *_ in vectorized['periods']] == ['12-2023', '01-2024']
+
+
+def test_segment_gets_journal_permissions(workdir):
+    notes = notes_store()
+    notes.add([note('a')])
+    os.chmod(pa.Note.FILE_PATH + pa.JOURNAL_SUFFIX, 0o640)
+    with notes.transaction():
+        notes.add([note('b')])
+    segment = next(name for name in os.listdir('.') if name.endswith('.seg'))
+    assert os.stat(segment).st_mode & 0o777 == 0o640
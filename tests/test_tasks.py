@@ -0,0 +1,40 @@
+import pytest
+
+import personal_assisnant as pa
+
+
+def task(title, due_date='01-01-2024'):
+    return pa.TasksManager.build(title, '', 'Высокий', due_date)
+
+
+def test_startup_reminders_are_capped(workdir):
+    pa.get_repository(pa.Task).add([task(f'задача {i}') for i in range(12)])
+    reminded = []
+    pa.TaskReminder(reminded.append, limit=5).check()
+    assert len(reminded) == 6
+    assert reminded[-1].startswith('...и ещё задач с наступившим дедлайном: 7')
+
+
+def test_view_deadlines_rejects_non_numeric_count(workdir, monkeypatch, capsys):
+    answers = iter(['1', 'много'])
+    monkeypatch.setattr('builtins.input', lambda prompt='': next(answers))
+    pa.TasksManager.view_deadlines()
+    assert 'Некорректное число.' in capsys.readouterr().out
+
+
+def titles(records):
+    return [record['title'] for record in records]
+
+
+@pytest.mark.parametrize('backend', ['json', 'sqlite'])
+def test_select_records_sorts_and_filters(workdir, monkeypatch, backend):
+    monkeypatch.setattr(pa, 'STORAGE_BACKEND', backend)
+    repository = pa.get_repository(pa.Task)
+    repository.add([task('поздняя', '05-01-2025'), task('ранняя', '20-12-2023'), task('средняя', '10-06-2024')])
+    middle = next(record for record in repository if record['title'] == 'средняя')
+    pa.TasksManager.complete(middle['id'])
+    assert titles(pa.select_records(repository)) == ['поздняя', 'ранняя', 'средняя']
+    assert titles(pa.select_records(repository, 'due_date')) == ['ранняя', 'средняя', 'поздняя']
+    assert titles(pa.select_records(repository, 'due_date', reverse=True)) == ['поздняя', 'средняя', 'ранняя']
+    assert titles(pa.TasksManager.select('due_date', 'not done')) == ['ранняя', 'поздняя']
+    assert titles(pa.TasksManager.select(None, 'done')) == ['средняя']